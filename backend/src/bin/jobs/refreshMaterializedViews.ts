@@ -19,6 +19,9 @@ const job: GitmeshJob = {
     await dbOptions.database.sequelize.query(
       'refresh materialized view concurrently "memberActivityAggregatesMVs"',
     )
+    await dbOptions.database.sequelize.query(
+      'refresh materialized view concurrently "memberMonthlyEngagement"',
+    )
 
     processingRefreshMemberAggregteMVs = false
   },
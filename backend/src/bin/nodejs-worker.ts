@@ -19,6 +19,11 @@ import { NodeWorkerMessageBase } from '../types/mq/nodeWorkerMessageBase'
 import { processIntegration, processWebhook } from './worker/integrations'
 import { processGenerateInsights } from '../serverless/microservices/nodejs/analytics/insightGenerator'
 import { SQS_CLIENT } from '@/serverless/utils/serviceSQS'
+import {
+  MESSAGE_PAYLOAD_ATTRIBUTES,
+  decodeMessageBody,
+  removeMessagePayload,
+} from '@/serverless/utils/messagePayload'
 
 /* eslint-disable no-constant-condition */
 
@@ -38,7 +43,7 @@ const receive = async (delayed?: boolean): Promise<SqsMessage | undefined> => {
   const params: SqsReceiveMessageRequest = {
     QueueUrl: delayed ? SQS_CONFIG.nodejsWorkerDelayableQueue : SQS_CONFIG.nodejsWorkerQueue,
     MessageAttributeNames: !delayed
-      ? undefined
+      ? MESSAGE_PAYLOAD_ATTRIBUTES
       : ['remainingDelaySeconds', 'tenantId', 'targetQueueUrl'],
   }
 
@@ -145,7 +150,7 @@ async function handleMessages() {
 
   const processSingleMessage = async (message: SqsMessage): Promise<void> => {
     await tracer.startActiveSpan('ProcessMessage', async (span) => {
-      const msg: NodeWorkerMessageBase = JSON.parse(message.Body)
+      const msg: NodeWorkerMessageBase = JSON.parse(decodeMessageBody(message))
 
       const messageLogger = getChildLogger('messageHandler', serviceLogger, {
         messageId: message.MessageId,
@@ -197,6 +202,7 @@ async function handleMessages() {
             async () => {
               // remove the message from the queue as it's about to be processed
               await removeFromQueue(message.ReceiptHandle)
+              removeMessagePayload(message)
               messagesInProgress.set(message.MessageId, msg)
               try {
                 await processFunction(msg, messageLogger)
@@ -0,0 +1 @@
+DROP INDEX CONCURRENTLY IF EXISTS "ix_activities_tenantId_timestamp";
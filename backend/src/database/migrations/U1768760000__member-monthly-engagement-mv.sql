@@ -0,0 +1 @@
+drop materialized view if exists "memberMonthlyEngagement";
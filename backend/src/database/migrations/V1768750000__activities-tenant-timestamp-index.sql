@@ -0,0 +1 @@
+CREATE INDEX CONCURRENTLY IF NOT EXISTS "ix_activities_tenantId_timestamp" ON activities ("tenantId", "timestamp") INCLUDE ("memberId", score) WHERE "deletedAt" IS NULL;
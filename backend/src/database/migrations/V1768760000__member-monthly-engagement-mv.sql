@@ -0,0 +1,23 @@
+-- Monthly engagement of every member, read by the members score worker.
+-- The sums of squares of the daily aggregates let the worker compute the standard deviation of the daily activity
+-- of every month, with the days without activity counting as zero.
+create materialized view "memberMonthlyEngagement" as
+select daily."tenantId",
+       daily."memberId",
+       date_trunc('month', daily.day)::date   as month,
+       sum(daily.activities)                  as activities,
+       sum(daily.activities * daily.activities) as "activitiesSquares",
+       sum(daily.score)                       as score,
+       sum(daily.score * daily.score)         as "scoreSquares"
+from (select "tenantId",
+             "memberId",
+             date("timestamp")       as day,
+             count(*)                as activities,
+             coalesce(sum(score), 0) as score
+      from activities
+      where "deletedAt" is null
+      group by "tenantId", "memberId", date("timestamp")) daily
+group by daily."tenantId", daily."memberId", date_trunc('month', daily.day);
+
+create unique index ix_membermonthlyengagement_tenantid_memberid_month
+    on "memberMonthlyEngagement" ("tenantId", "memberId", month);
@@ -0,0 +1 @@
+CREATE INDEX CONCURRENTLY IF NOT EXISTS "ix_activities_tenantId_createdAt" ON activities ("tenantId", "createdAt") INCLUDE ("memberId", "timestamp", score) WHERE "deletedAt" IS NULL;
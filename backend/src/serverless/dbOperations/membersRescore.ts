@@ -0,0 +1,73 @@
+import { getServiceChildLogger } from '@gitmesh/logging'
+import { sendPythonWorkerMessage } from '../utils/pythonWorkerSQS'
+import { PythonWorkerMessageType } from '../types/workerTypes'
+
+const log = getServiceChildLogger('dbOperations.membersRescore')
+
+// How long the members of a tenant are collected before they are sent to be rescored together
+const RESCORE_DEBOUNCE_MS = 30 * 1000
+// Members are sent right away once a tenant has this many waiting
+const RESCORE_MAX_MEMBERS = 1000
+
+interface IPendingRescore {
+  memberIds: Set<string>
+  timer: NodeJS.Timeout
+}
+
+const pending = new Map<string, IPendingRescore>()
+
+/**
+ * Send the members of a tenant waiting to be rescored to the python worker.
+ * The message goes to the same FIFO group as the tenant's members score run,
+ * so a rescore never runs concurrently with a full run of the tenant.
+ * @param tenantId The tenant ID
+ */
+async function flushMembersRescore(tenantId: string): Promise<void> {
+  const rescore = pending.get(tenantId)
+  if (!rescore) {
+    return
+  }
+  pending.delete(tenantId)
+  clearTimeout(rescore.timer)
+
+  try {
+    await sendPythonWorkerMessage(
+      tenantId,
+      {
+        type: PythonWorkerMessageType.MEMBERS_RESCORE,
+        tenant: tenantId,
+        members: Array.from(rescore.memberIds),
+      },
+      `${tenantId}-${PythonWorkerMessageType.MEMBERS_SCORE}`,
+    )
+  } catch (err) {
+    // The members are scored by the next tenant run anyway
+    log.error(err, { tenantId }, 'Error while sending the members rescore message!')
+  }
+}
+
+/**
+ * Queue members of a tenant to be rescored by the python worker.
+ * Members are collected for RESCORE_DEBOUNCE_MS, or until RESCORE_MAX_MEMBERS of them are waiting,
+ * so that a burst of activity upserts results in a single rescore message per tenant.
+ * @param tenantId The tenant ID
+ * @param memberIds IDs of the members that got new activities
+ */
+export async function queueMembersRescore(tenantId: string, memberIds: Iterable<string>): Promise<void> {
+  let rescore = pending.get(tenantId)
+  if (!rescore) {
+    rescore = {
+      memberIds: new Set<string>(),
+      timer: setTimeout(() => flushMembersRescore(tenantId), RESCORE_DEBOUNCE_MS),
+    }
+    pending.set(tenantId, rescore)
+  }
+
+  for (const memberId of memberIds) {
+    rescore.memberIds.add(memberId)
+  }
+
+  if (rescore.memberIds.size >= RESCORE_MAX_MEMBERS) {
+    await flushMembersRescore(tenantId)
+  }
+}
@@ -4,6 +4,8 @@ import ActivityService from '../../services/activityService'
 import IntegrationService from '../../services/integrationService'
 import MicroserviceService from '../../services/microserviceService'
 import { IServiceOptions } from '../../services/IServiceOptions'
+import { KUBE_MODE } from '../../conf'
+import { queueMembersRescore } from './membersRescore'
 
 /**
  * Update a bulk of members
@@ -34,7 +36,8 @@ async function upsertMembers(records: Array<any>, options: IServiceOptions): Pro
 }
 
 /**
- * Upsert a bulk of activities with members
+ * Upsert a bulk of activities with members.
+ * The members that got new activities are then queued to be rescored by the python worker.
  * @param records The records to perform the operation to
  * @returns Success/error message
  */
@@ -44,10 +47,16 @@ async function upsertActivityWithMembers(
   fireGitmeshWebhooks: boolean = true,
 ): Promise<any> {
   const activityService = new ActivityService(options)
+  const memberIds = new Set<string>()
 
   while (records.length > 0) {
     const record = records.shift()
-    await activityService.createWithMember(record, fireGitmeshWebhooks)
+    const activity = await activityService.createWithMember(record, fireGitmeshWebhooks)
+    memberIds.add(activity.memberId)
+  }
+
+  if (KUBE_MODE && memberIds.size > 0) {
+    await queueMembersRescore(options.currentTenant.id, memberIds)
   }
 }
 
@@ -0,0 +1,83 @@
+"""
+Compare the orjson and the standard library encoders of queue message bodies on realistic payloads:
+the member score updates sent by the members score worker and activities upserted with their members.
+
+Usage:
+    python benchmarks/encode_benchmark.py [n_records]
+"""
+import json
+import sys
+import timeit
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from uuid import uuid4
+
+from gitmesh.backend.infrastructure import sqs
+from gitmesh.backend.infrastructure.sqs import encode_body, string_converter
+
+
+def update_members(n):
+    return {
+        "tenant_id": str(uuid4()),
+        "operation": "update_members",
+        "records": [{"id": uuid4(), "update": {"score": i % 10}} for i in range(n)],
+    }
+
+
+def upsert_activities_with_members(n):
+    start = datetime(2023, 1, 1, tzinfo=timezone.utc)
+    return {
+        "tenant_id": str(uuid4()),
+        "operation": "upsert_activities_with_members",
+        "records": [
+            {
+                "type": "comment",
+                "platform": "github",
+                "timestamp": start + timedelta(minutes=i),
+                "score": Decimal("1.5"),
+                "isContribution": True,
+                "sourceId": str(1000000 + i),
+                "sourceParentId": str(1000000 + i // 10),
+                "channel": "https://github.com/alveoli-app/gitmesh-ce",
+                "body": "Thanks for the review, I pushed a fix for the failing test." * 3,
+                "title": "Fix the members score when a tenant has no activities",
+                "url": f"https://github.com/alveoli-app/gitmesh-ce/pull/{i}#issuecomment-{i}",
+                "attributes": {"state": "merged", "additions": i % 500, "deletions": i % 70, "labels": ["bug"]},
+                "member": {
+                    "id": uuid4(),
+                    "username": {"github": f"member-{i % 300}"},
+                    "displayName": f"Member {i % 300}",
+                    "emails": [f"member-{i % 300}@example.com"],
+                    "joinedAt": start,
+                    "attributes": {"location": {"github": "Berlin"}, "bio": {"github": "Developer"}},
+                },
+            }
+            for i in range(n)
+        ],
+    }
+
+
+def stdlib(body):
+    return json.dumps(body, default=string_converter)
+
+
+def main(n):
+    if sqs.orjson is None:
+        print("orjson is not installed, encode_body uses the standard library")
+
+    payloads = {
+        "UPDATE_MEMBERS": update_members(n),
+        "UPSERT_ACTIVITIES_WITH_MEMBERS": upsert_activities_with_members(n),
+    }
+    for name, payload in payloads.items():
+        for encoder_name, encoder in (("json", stdlib), ("encode_body", encode_body)):
+            runs, total = timeit.Timer(lambda: encoder(payload)).autorange()
+            elapsed = total / runs
+            size = len(encoder(payload).encode("utf-8"))
+            print(
+                f"{name:>31} {encoder_name:>11}: {elapsed * 1000:8.2f}ms  {n / elapsed:12.0f} records/s  {size} bytes"
+            )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
@@ -0,0 +1,86 @@
+"""
+Measure the throughput of python_worker.py end to end, on the in-process queue backend.
+
+The queue is filled with members_score messages of distinct tenants, the worker is started with the
+configuration of the environment (PYTHON_WORKER_CONCURRENCY, PYTHON_WORKER_ASYNC, ...) and stopped once
+it processed every message. Scoring a tenant is replaced by a sleep of job_ms milliseconds, so that the
+benchmark measures the overhead of the worker and of its queue traffic.
+
+Usage:
+    SQS_BACKEND=memory python benchmarks/worker_benchmark.py [n_messages] [job_ms]
+"""
+import json
+import os
+import runpy
+import signal
+import sys
+import threading
+import time
+
+os.environ.setdefault("SQS_BACKEND", "memory")
+os.environ.setdefault("SQS_PYTHON_WORKER_QUEUE", "python-worker-benchmark")
+
+import gitmesh.members_score  # noqa: E402
+from gitmesh.backend.enums import Services  # noqa: E402
+from gitmesh.backend.infrastructure import SQS  # noqa: E402
+from gitmesh.backend.infrastructure.config import PYTHON_WORKER_QUEUE, SQS_BACKEND  # noqa: E402
+from gitmesh.backend.infrastructure.memory_sqs import get_queue  # noqa: E402
+
+WORKER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "python_worker.py")
+
+job_seconds = 0.0
+
+
+def job(tenant_id):
+    time.sleep(job_seconds)
+
+
+def main(n_messages, job_ms):
+    global job_seconds
+    job_seconds = job_ms / 1000
+
+    if SQS_BACKEND != "memory":
+        raise ValueError("The worker benchmark runs on the in-process queue backend, set SQS_BACKEND=memory")
+
+    SQS(PYTHON_WORKER_QUEUE).send_message_batch(
+        [
+            dict(
+                body=dict(service=Services.MEMBERS_SCORE.value, tenant=f"tenant-{i}"),
+                id=f"tenant-{i}",
+                deduplicationId=str(i),
+            )
+            for i in range(n_messages)
+        ]
+    )
+    queue = get_queue(PYTHON_WORKER_QUEUE)
+    gitmesh.members_score.members_score_worker = job
+
+    timings = {}
+
+    def stop_when_drained():
+        while len(queue):
+            time.sleep(0.001)
+        timings["end"] = time.perf_counter()
+        os.kill(os.getpid(), signal.SIGTERM)
+
+    timings["start"] = time.perf_counter()
+    threading.Thread(target=stop_when_drained, daemon=True).start()
+    runpy.run_path(WORKER)
+
+    elapsed = timings["end"] - timings["start"]
+    print(
+        json.dumps(
+            {
+                "messages": n_messages,
+                "job_ms": job_ms,
+                "concurrency": os.environ.get("PYTHON_WORKER_CONCURRENCY", "1"),
+                "async": os.environ.get("PYTHON_WORKER_ASYNC", "false"),
+                "seconds": round(elapsed, 3),
+                "messages_per_second": round(n_messages / elapsed, 1),
+            }
+        )
+    )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000, float(sys.argv[2]) if len(sys.argv) > 2 else 0)
@@ -30,15 +30,17 @@ class MembersController(BaseController):
         """
         return self.sqs.send_message(self.tenant_id, Operations.UPDATE_MEMBERS_TO_MERGE, to_merge, send)
 
-    def update(self, updates, send=True):
+    def update(self, updates, send=True, chunk_size=None):
         """
-        Function to update the integrations
+        Function to update the members
 
         Args:
             updates ([{id, update}]): list of dicts with id and corresponding update
+            chunk_size (int, optional): maximum number of updates sent in each message.
+                                        Defaults to None, messages are only limited by their size.
         """
         if type(updates) is not list:
             updates = [
                 updates,
             ]
-        return self.sqs.send_message(self.tenant_id, Operations.UPDATE_MEMBERS, updates, send)
+        return self.sqs.send_message(self.tenant_id, Operations.UPDATE_MEMBERS, updates, send, chunk_size=chunk_size)
@@ -3,3 +3,4 @@ from enum import Enum
 
 class Services(Enum):
     MEMBERS_SCORE = "members_score"
+    MEMBERS_RESCORE = "members_rescore"
@@ -7,5 +7,8 @@ if not KUBE_MODE:
     dotenv.load_dotenv(found)
 
 from .sqs import SQS  # noqa
+from .async_sqs import AsyncSQS  # noqa
 from .db_operations_sqs import DbOperationsSQS  # noqa
 from .services_sqs import ServicesSQS  # noqa
+from .visibility_heartbeat import VisibilityHeartbeat  # noqa
+from .acknowledger import Acknowledger  # noqa
@@ -0,0 +1,98 @@
+import threading
+import time
+
+from gitmesh.backend.infrastructure.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+class Acknowledger:
+    """
+    Delete processed SQS messages in batches.
+    Receipt handles are accumulated and deleted with DeleteMessageBatch by a background thread, once max_batch
+    of them are pending or once the oldest of them has been pending for max_delay seconds. Acknowledging a message
+    never waits on the network, so it can also be done from an event loop.
+
+    In a FIFO queue the next message of a group is received only once the previous one is deleted,
+    so max_delay should stay small compared to the time it takes to process a message.
+
+    Usage:
+        with Acknowledger(sqs) as acknowledger:
+            process(message)
+            acknowledger.ack(message["ReceiptHandle"])
+    """
+
+    def __init__(self, sqs, max_batch=10, max_delay=1.0):
+        """
+        Initialise the acknowledger of a queue.
+
+        Args:
+            sqs (SQS): the queue the messages were received from
+            max_batch (int, optional): number of pending receipt handles that triggers a delete. Defaults to 10.
+            max_delay (float, optional): how long a receipt handle can be pending, in seconds. Defaults to 1.
+        """
+        self.sqs = sqs
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._pending = []
+        self._oldest = None
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._full = threading.Event()
+        self._thread = threading.Thread(target=self._tick, daemon=True)
+
+    def ack(self, receipt_handle):
+        """
+        Mark a message as processed, it is deleted with the next batch.
+
+        Args:
+            receipt_handle (str): receipt handle from the SQS message
+        """
+        with self._lock:
+            if not self._pending:
+                self._oldest = time.monotonic()
+            self._pending.append(receipt_handle)
+            if len(self._pending) >= self.max_batch:
+                self._full.set()
+
+    def flush(self):
+        """
+        Delete the pending messages now.
+        """
+        with self._lock:
+            receipt_handles, self._pending = self._pending, []
+        if not receipt_handles:
+            return
+        try:
+            self.sqs.delete_message_batch(receipt_handles)
+        except Exception as e:
+            # The messages become visible again and are processed a second time
+            logger.error(f"Could not delete {len(receipt_handles)} processed messages: {e}")
+
+    def _tick(self):
+        while not self._stopped.is_set():
+            self._full.wait(self.max_delay / 4)
+            self._full.clear()
+            with self._lock:
+                due = len(self._pending) >= self.max_batch or (
+                    self._pending and time.monotonic() - self._oldest >= self.max_delay
+                )
+            if due:
+                self.flush()
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        self._full.set()
+        self._thread.join()
+        self.flush()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+        return False
@@ -0,0 +1,151 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from gitmesh.backend.infrastructure.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+class AsyncSQS:
+    """
+    Asyncio interface to an SQS queue, with the same methods as SQS as coroutines.
+
+    Requests are made by the boto3 client of the wrapped SQS instance, which is thread safe, in a bounded pool
+    of threads. While a request waits on the network the event loop keeps running, so a worker can keep a
+    long poll in flight and pipeline many sends while it is busy with jobs.
+
+    Usage:
+        sqs = AsyncSQS(SQS(PYTHON_WORKER_QUEUE))
+        await sqs.consume(handler, concurrency=4, stop=stop_event)
+    """
+
+    def __init__(self, sqs, max_concurrency=10):
+        """
+        Initialise the asyncio interface of a queue.
+
+        Args:
+            sqs (SQS): the queue
+            max_concurrency (int, optional): maximum number of requests in flight at a time. Defaults to 10.
+        """
+        self.sqs = sqs
+        self.sqs_url = sqs.sqs_url
+        self.max_concurrency = max_concurrency
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="sqs")
+
+    async def _call(self, method, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, lambda: method(*args, **kwargs))
+
+    async def send_message(self, body, id, deduplicationId, attributes=None):
+        return await self._call(self.sqs.send_message, body, id, deduplicationId, attributes)
+
+    async def send_message_batch(self, entries, max_retries=3):
+        return await self._call(self.sqs.send_message_batch, entries, max_retries)
+
+    async def receive_message(self, delete=True, wait_time_seconds=0, visibility_timeout=60):
+        return await self._call(self.sqs.receive_message, delete, wait_time_seconds, visibility_timeout)
+
+    async def receive_messages(self, max_number=10, wait_time_seconds=0, visibility_timeout=60):
+        return await self._call(self.sqs.receive_messages, max_number, wait_time_seconds, visibility_timeout)
+
+    async def change_message_visibility(self, receipt_handle, visibility_timeout):
+        return await self._call(self.sqs.change_message_visibility, receipt_handle, visibility_timeout)
+
+    async def delete_message(self, receipt_handle):
+        return await self._call(self.sqs.delete_message, receipt_handle)
+
+    async def delete_message_batch(self, receipt_handles, max_retries=3):
+        return await self._call(self.sqs.delete_message_batch, receipt_handles, max_retries)
+
+    async def send_many(self, entries, batch_size=10):
+        """
+        Send many messages, with up to max_concurrency SendMessageBatch requests in flight.
+        The messages of a message group are sent one batch after the other so that their order is kept,
+        the message groups are sent concurrently.
+
+        Args:
+            entries ([dict]): messages to send, as dicts with body, id (message group) and deduplicationId
+            batch_size (int, optional): number of messages per request, at most 10. Defaults to 10.
+
+        Returns:
+            int: number of messages sent
+        """
+        groups = {}
+        for entry in entries:
+            groups.setdefault(entry["id"], []).append(entry)
+
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def _send_group(group):
+            sent = 0
+            for start in range(0, len(group), batch_size):
+                async with semaphore:
+                    sent += await self.send_message_batch(group[start : start + batch_size])
+            return sent
+
+        return sum(await asyncio.gather(*(_send_group(group) for group in groups.values())))
+
+    async def consume(self, handler, concurrency=1, wait_time_seconds=20, visibility_timeout=60, stop=None):
+        """
+        Receive messages and process them with up to concurrency handlers at a time.
+
+        A long poll is kept in flight whenever a handler is free, also while other messages are being processed,
+        so new messages are picked up as soon as there is room for them. Handlers are responsible for deleting
+        their message. Once stop is set no new poll is started, and the messages being processed are drained.
+        When consume is cancelled the poll and the handlers are cancelled too, their messages become visible again
+        once their visibility timeout expires.
+
+        Args:
+            handler (coroutine function): called with every received message
+            concurrency (int, optional): maximum number of messages processed at a time. Defaults to 1.
+            wait_time_seconds (int, optional): how long a poll waits for messages. Defaults to 20.
+            visibility_timeout (int, optional): how long received messages are invisible to other receivers
+            stop (asyncio.Event, optional): set to stop consuming. Defaults to None (consume forever).
+        """
+        jobs = set()
+        poll = None
+
+        try:
+            while True:
+                stopping = stop is not None and stop.is_set()
+                free = concurrency - len(jobs)
+                if poll is None and free > 0 and not stopping:
+                    poll = asyncio.ensure_future(
+                        self.receive_messages(
+                            max_number=min(10, free),
+                            wait_time_seconds=wait_time_seconds,
+                            visibility_timeout=visibility_timeout,
+                        )
+                    )
+
+                pending = jobs | {poll} if poll is not None else jobs
+                if not pending:
+                    return
+
+                # The timeout lets the loop notice stop while the poll and the jobs are still running
+                done, _ = await asyncio.wait(pending, timeout=1, return_when=asyncio.FIRST_COMPLETED)
+
+                if poll in done:
+                    try:
+                        messages = poll.result()
+                    except Exception as e:
+                        logger.error(f"Error while receiving messages from {self.sqs_url}: {e}")
+                        messages = []
+                        await asyncio.sleep(1)
+                    poll = None
+                    # Messages received after stop was set are still processed, they are already invisible
+                    jobs.update(asyncio.ensure_future(handler(message)) for message in messages)
+
+                for job in done & jobs:
+                    jobs.discard(job)
+                    if not job.cancelled() and job.exception() is not None:
+                        logger.error(f"Error while processing a message from {self.sqs_url}: {job.exception()}")
+        except asyncio.CancelledError:
+            pending = jobs | {poll} if poll is not None else jobs
+            for future in pending:
+                future.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            raise
+
+    def close(self):
+        self._executor.shutdown(wait=True)
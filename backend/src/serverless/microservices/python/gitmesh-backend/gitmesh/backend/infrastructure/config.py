@@ -1,4 +1,5 @@
 import os
+import tempfile
 
 # TODO-kube
 KUBE_MODE = os.environ.get("KUBE_MODE") is not None
@@ -29,6 +30,44 @@ SQS_ENDPOINT_URL = os.environ.get("SQS_ENDPOINT")
 SQS_ACCESS_KEY_ID = os.environ.get("SQS_AWS_ACCESS_KEY_ID")
 SQS_SECRET_ACCESS_KEY = os.environ.get("SQS_AWS_SECRET_ACCESS_KEY")
 SQS_REGION = os.environ.get("SQS_AWS_REGION")
+# Queue backend: "sqs" (SQS or LocalStack) or "memory" (in-process queues, for benchmarks and load tests)
+SQS_BACKEND = os.environ.get("SQS_BACKEND") or "sqs"
+PYTHON_WORKER_CONCURRENCY = int(os.environ.get("PYTHON_WORKER_CONCURRENCY") or 1)
+PYTHON_WORKER_VISIBILITY_TIMEOUT = int(os.environ.get("PYTHON_WORKER_VISIBILITY_TIMEOUT") or 120)
+# Run the python worker on an asyncio event loop, which keeps a long poll in flight while tenants are scored
+PYTHON_WORKER_ASYNC = os.environ.get("PYTHON_WORKER_ASYNC", "false").lower() == "true"
+SQS_MAX_MESSAGE_BYTES = int(os.environ.get("SQS_MAX_MESSAGE_BYTES") or 256 * 1024)
+SQS_MAX_BATCH_BYTES = int(os.environ.get("SQS_MAX_BATCH_BYTES") or 256 * 1024)
+# Compression of message bodies: "gzip", "zstd" or "" (none). The queue of the nodejs worker gets gzip instead of zstd
+SQS_COMPRESSION = os.environ.get("SQS_COMPRESSION") or ""
+SQS_COMPRESSION_MIN_BYTES = int(os.environ.get("SQS_COMPRESSION_MIN_BYTES") or 1024)
+# Bodies still too large for a message are stored in this directory and only their path is sent
+SQS_CLAIM_CHECK_DIR = os.environ.get("SQS_CLAIM_CHECK_DIR")
+# Largest body packed by DbOperationsSQS before compression, above SQS_MAX_MESSAGE_BYTES only with a claim check
+SQS_MAX_PAYLOAD_BYTES = int(
+    os.environ.get("SQS_MAX_PAYLOAD_BYTES") or (8 * 1024 * 1024 if SQS_CLAIM_CHECK_DIR else SQS_MAX_MESSAGE_BYTES)
+)
+
+# Members score settings
+# Source of the monthly engagement of the members: "activities", "rollup" or "engagement_view"
+MEMBERS_SCORE_SOURCE = os.environ.get("MEMBERS_SCORE_SOURCE") or "activities"
+MEMBERS_SCORE_BINNING = os.environ.get("MEMBERS_SCORE_BINNING") or "kmeans"
+# Opt-in: engagement levels of tenants with more active members than this are fitted on a stratified sample.
+# 0 (the default) fits them on every active member
+MEMBERS_SCORE_BINNING_SAMPLE_SIZE = int(os.environ.get("MEMBERS_SCORE_BINNING_SAMPLE_SIZE") or 0)
+# Opt-in: persisted engagement levels are reused until the population stability index of the raw scores exceeds
+# MEMBERS_SCORE_LEVELS_MAX_DRIFT. Members rescores need them and are skipped while it is off.
+MEMBERS_SCORE_LEVELS = os.environ.get("MEMBERS_SCORE_LEVELS", "false").lower() == "true"
+MEMBERS_SCORE_LEVELS_MAX_DRIFT = float(os.environ.get("MEMBERS_SCORE_LEVELS_MAX_DRIFT") or 0.1)
+# The activity rollups and engagement levels stored here are a cache: a worker that does not find them, for instance
+# on a new pod, rebuilds the rollup and refits the levels. Point it at a shared volume to reuse them across pods.
+MEMBERS_SCORE_STATE_DIR = os.environ.get("MEMBERS_SCORE_STATE_DIR") or os.path.join(
+    tempfile.gettempdir(), "gitmesh-members-score"
+)
+MEMBERS_SCORE_ROLLUP_REBUILD_DAYS = int(os.environ.get("MEMBERS_SCORE_ROLLUP_REBUILD_DAYS") or 7)
+# Activities committed late or with a skewed createdAt are picked up when they are at most this far behind
+# the watermark of the rollup, older ones only by the next rebuild
+MEMBERS_SCORE_ROLLUP_OVERLAP_MINUTES = int(os.environ.get("MEMBERS_SCORE_ROLLUP_OVERLAP_MINUTES") or 60)
 
 # DB Settings
 
@@ -45,3 +84,6 @@ DB_DATABASE = os.environ.get("DB_DATABASE")
 DB_HOST = os.environ.get("DB_READ_HOST")
 DB_PORT = os.environ.get("DB_PORT")
 DB_URL = f'postgresql://{DB_USERNAME}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_DATABASE}'
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE") or 5)
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW") or 10)
+DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE") or 1800)
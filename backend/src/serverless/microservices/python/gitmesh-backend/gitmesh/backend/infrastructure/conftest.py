@@ -0,0 +1,23 @@
+from uuid import uuid4
+
+import pytest
+
+from gitmesh.backend.infrastructure import sqs as sqs_module
+from gitmesh.backend.infrastructure.sqs import SQS
+
+
+@pytest.fixture
+def make_sqs(monkeypatch):
+    """
+    Factory of SQS queues on the in-process memory backend, without compression.
+    Every queue gets a name of its own unless one is given, and client replaces the memory client when given.
+    """
+    monkeypatch.setattr(sqs_module, "SQS_BACKEND", "memory")
+
+    def _make_sqs(client=None, sqs_url=None):
+        sqs = SQS(sqs_url or f"test-{uuid4()}", compression="")
+        if client is not None:
+            sqs.sqs = client
+        return sqs
+
+    return _make_sqs
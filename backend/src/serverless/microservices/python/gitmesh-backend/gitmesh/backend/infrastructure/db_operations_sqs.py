@@ -1,4 +1,5 @@
 from gitmesh.backend.infrastructure import SQS
+from gitmesh.backend.infrastructure.sqs import encode_body
 from gitmesh.backend.infrastructure.logging import get_logger
 from gitmesh.backend.enums import Operations
 import os
@@ -6,7 +7,12 @@ from uuid import uuid1 as uuid
 from functools import reduce
 import json
 
-from gitmesh.backend.infrastructure.config import KUBE_MODE, NODEJS_WORKER_QUEUE
+from gitmesh.backend.infrastructure.config import (
+    KUBE_MODE,
+    NODEJS_WORKER_QUEUE,
+    SQS_COMPRESSION,
+    SQS_MAX_PAYLOAD_BYTES,
+)
 
 logger = get_logger(__name__)
 
@@ -16,9 +22,13 @@ class DbOperationsSQS(SQS):
         # TODO-kube
         if KUBE_MODE:
             db_operations_sqs_url = NODEJS_WORKER_QUEUE
+            # The messages are consumed by the nodejs worker, which only decodes gzip
+            compression = "gzip" if SQS_COMPRESSION == "zstd" else SQS_COMPRESSION
         else:
             db_operations_sqs_url = os.environ.get("DB_OPERATIONS_SQS_URL")
-        super().__init__(db_operations_sqs_url)
+            # The dbOperations lambda handler parses the bodies as plain JSON
+            compression = ""
+        super().__init__(db_operations_sqs_url, compression=compression)
 
     @staticmethod
     def validate_update(records):
@@ -33,7 +43,45 @@ class DbOperationsSQS(SQS):
 
         return out
 
-    def send_message(self, tenant_id, operation, records, send=True):
+    @staticmethod
+    def pack(envelope, records, chunk_size=None, max_bytes=SQS_MAX_PAYLOAD_BYTES):
+        """
+        Pack records into as few message bodies as possible.
+        Each body is the envelope with a records list, and is filled up to max_bytes.
+
+        Args:
+            envelope (dict): the fields shared by every message
+            records ([dict]): list of records to pack
+            chunk_size (int, optional): maximum number of records in a message. Defaults to None (no limit).
+            max_bytes (int, optional): maximum size of a message body. Defaults to SQS_MAX_PAYLOAD_BYTES.
+
+        Returns:
+            [str]: list of encoded message bodies
+        """
+        head = encode_body(envelope)[:-1] + ', "records": ['
+        tail = "]}"
+        empty_size = len(head) + len(tail)
+
+        bodies = []
+        chunk = []
+        size = empty_size
+        for record in records:
+            encoded = encode_body(record)
+            record_size = len(encoded.encode("utf-8")) + 2
+            if chunk and (size + record_size > max_bytes or len(chunk) == chunk_size):
+                bodies.append(head + ", ".join(chunk) + tail)
+                chunk = []
+                size = empty_size
+            if size + record_size > max_bytes:
+                logger.warning(f"Record of {record_size} bytes does not fit in a message of {max_bytes} bytes")
+            chunk.append(encoded)
+            size += record_size
+        if chunk:
+            bodies.append(head + ", ".join(chunk) + tail)
+
+        return bodies
+
+    def send_message(self, tenant_id, operation, records, send=True, chunk_size=None):
         """
         Send a message to the SQS queue that will trigger Write operations
 
@@ -41,6 +89,11 @@ class DbOperationsSQS(SQS):
             tenant_id (str): tenant id
             operation (Operation): An operation from gitmesh.sqs_api.operations
             records ([dict]): list of records to be added or updated
+            chunk_size (int, optional): maximum number of records sent in each message.
+                                        Defaults to None, messages are only limited by SQS_MAX_PAYLOAD_BYTES.
+
+        Returns:
+            int: number of messages sent
         """
         tenant_id = str(tenant_id)
 
@@ -76,15 +129,16 @@ class DbOperationsSQS(SQS):
             else:
                 return None
 
-            chuncked = [records[i : i + 5] for i in range(0, len(records), 5)]
-
-            for chunk in chuncked:
-                body = dict(tenant_id=tenant_id, operation=operation.value, records=chunk)
-                # TODO-kube
-                if KUBE_MODE:
-                    body["type"] = "db_operations"
-                if send:
-                    super().send_message(body, message_id, DbOperationsSQS.make_id())
-                else:
-                    return 1
+            if not send:
+                return 1
+
+            envelope = dict(tenant_id=tenant_id, operation=operation.value)
+            # TODO-kube
+            if KUBE_MODE:
+                envelope["type"] = "db_operations"
+
+            bodies = DbOperationsSQS.pack(envelope, records, chunk_size)
+            return self.send_message_batch(
+                [dict(body=body, id=message_id, deduplicationId=DbOperationsSQS.make_id()) for body in bodies]
+            )
         return None
@@ -0,0 +1,181 @@
+import threading
+import time
+from collections import deque
+from uuid import uuid4
+
+# How long SQS remembers the deduplication ids of FIFO queues
+DEDUPLICATION_INTERVAL = 5 * 60
+
+
+class _Message:
+    __slots__ = ("id", "body", "attributes", "group_id", "receipt_handle", "visible_at", "receive_count")
+
+    def __init__(self, body, attributes, group_id):
+        self.id = str(uuid4())
+        self.body = body
+        self.attributes = attributes
+        self.group_id = group_id
+        self.receipt_handle = None
+        self.visible_at = 0.0
+        self.receive_count = 0
+
+
+class MemoryQueue:
+    """
+    In-process FIFO queue with the semantics of an SQS FIFO queue:
+    - messages of a message group are received in the order they were sent, and no message of a group is received
+      while an earlier message of the group is in flight
+    - a message sent with a deduplication id already sent in the last DEDUPLICATION_INTERVAL seconds is dropped
+    - a received message is invisible to other receivers until its visibility timeout expires or it is deleted
+    """
+
+    def __init__(self):
+        self._groups = {}
+        self._deduplication_ids = {}
+        self._deduplication_order = deque()
+        self._in_flight = {}
+        self._changed = threading.Condition()
+
+    def send(self, body, attributes, group_id, deduplication_id):
+        with self._changed:
+            now = time.monotonic()
+            while self._deduplication_order and now - self._deduplication_order[0][0] >= DEDUPLICATION_INTERVAL:
+                self._deduplication_ids.pop(self._deduplication_order.popleft()[1], None)
+            if deduplication_id in self._deduplication_ids:
+                return None
+            self._deduplication_ids[deduplication_id] = now
+            self._deduplication_order.append((now, deduplication_id))
+
+            message = _Message(body, attributes, group_id)
+            self._groups.setdefault(group_id, deque()).append(message)
+            self._changed.notify_all()
+            return message
+
+    def receive(self, max_number, wait_time_seconds, visibility_timeout):
+        deadline = time.monotonic() + wait_time_seconds
+        with self._changed:
+            while True:
+                now = time.monotonic()
+                messages = self._receive(now, max_number, visibility_timeout)
+                if messages or now >= deadline:
+                    return messages
+                # Wake up when a message is sent, deleted or made visible, or when the next visibility timeout expires
+                next_visible = min((m.visible_at for m in self._in_flight.values()), default=deadline)
+                self._changed.wait(max(min(deadline, next_visible) - now, 0.001))
+
+    def _receive(self, now, max_number, visibility_timeout):
+        messages = []
+        for group in self._groups.values():
+            # Only the head of a group can be received, and only once it is visible again
+            head = group[0]
+            if head.visible_at > now:
+                continue
+            self._in_flight.pop(head.receipt_handle, None)
+            head.receipt_handle = str(uuid4())
+            head.visible_at = now + visibility_timeout
+            head.receive_count += 1
+            self._in_flight[head.receipt_handle] = head
+            messages.append(head)
+            if len(messages) == max_number:
+                break
+        return messages
+
+    def change_visibility(self, receipt_handle, visibility_timeout):
+        with self._changed:
+            message = self._in_flight.get(receipt_handle)
+            if message is None:
+                raise ValueError(f"Message with receipt handle {receipt_handle} is not in flight")
+            message.visible_at = time.monotonic() + visibility_timeout
+            self._changed.notify_all()
+
+    def delete(self, receipt_handle):
+        with self._changed:
+            # Like SQS, deleting a message that is no longer in flight is not an error
+            message = self._in_flight.pop(receipt_handle, None)
+            if message is None:
+                return
+            group = self._groups[message.group_id]
+            group.remove(message)
+            if not group:
+                del self._groups[message.group_id]
+            self._changed.notify_all()
+
+    def __len__(self):
+        with self._changed:
+            return sum(len(group) for group in self._groups.values())
+
+
+_queues = {}
+_queues_lock = threading.Lock()
+
+
+def get_queue(queue_url):
+    """
+    The in-process queue of an URL, shared by all the clients of the process.
+
+    Args:
+        queue_url (str): the queue URL
+    """
+    with _queues_lock:
+        return _queues.setdefault(queue_url, MemoryQueue())
+
+
+class MemorySQSClient:
+    """
+    Stand-in for the boto3 SQS client, backed by in-process queues.
+    Only the operations used by SQS are implemented, with the same request and response shapes, so that queue
+    traffic and worker throughput can be measured without SQS or LocalStack.
+    """
+
+    def send_message(
+        self, QueueUrl, MessageBody, MessageGroupId, MessageDeduplicationId, MessageAttributes=None, **kwargs
+    ):
+        message = get_queue(QueueUrl).send(MessageBody, MessageAttributes, MessageGroupId, MessageDeduplicationId)
+        return {"MessageId": message.id if message else str(uuid4())}
+
+    def send_message_batch(self, QueueUrl, Entries):
+        successful = [
+            {
+                "Id": entry["Id"],
+                **self.send_message(
+                    QueueUrl,
+                    entry["MessageBody"],
+                    entry["MessageGroupId"],
+                    entry["MessageDeduplicationId"],
+                    entry.get("MessageAttributes"),
+                ),
+            }
+            for entry in Entries
+        ]
+        return {"Successful": successful, "Failed": []}
+
+    def receive_message(self, QueueUrl, MaxNumberOfMessages=1, VisibilityTimeout=30, WaitTimeSeconds=0, **kwargs):
+        messages = get_queue(QueueUrl).receive(MaxNumberOfMessages, WaitTimeSeconds, VisibilityTimeout)
+        if not messages:
+            return {}
+        return {
+            "Messages": [
+                {
+                    "MessageId": message.id,
+                    "ReceiptHandle": message.receipt_handle,
+                    "Body": message.body,
+                    "Attributes": {
+                        "MessageGroupId": message.group_id,
+                        "ApproximateReceiveCount": str(message.receive_count),
+                    },
+                    **({"MessageAttributes": message.attributes} if message.attributes else {}),
+                }
+                for message in messages
+            ]
+        }
+
+    def change_message_visibility(self, QueueUrl, ReceiptHandle, VisibilityTimeout):
+        get_queue(QueueUrl).change_visibility(ReceiptHandle, VisibilityTimeout)
+
+    def delete_message(self, QueueUrl, ReceiptHandle):
+        get_queue(QueueUrl).delete(ReceiptHandle)
+
+    def delete_message_batch(self, QueueUrl, Entries):
+        for entry in Entries:
+            self.delete_message(QueueUrl, entry["ReceiptHandle"])
+        return {"Successful": [{"Id": entry["Id"]} for entry in Entries], "Failed": []}
@@ -0,0 +1,160 @@
+import base64
+import gzip
+import json
+import os
+from uuid import uuid4
+
+from gitmesh.backend.infrastructure.config import (
+    SQS_CLAIM_CHECK_DIR,
+    SQS_COMPRESSION,
+    SQS_COMPRESSION_MIN_BYTES,
+    SQS_MAX_MESSAGE_BYTES,
+)
+from gitmesh.backend.infrastructure.logging import get_logger
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = get_logger(__name__)
+
+if SQS_COMPRESSION == "zstd" and zstandard is None:
+    logger.warning("zstandard is not installed, message bodies are compressed with gzip")
+
+# Message attributes that tell consumers how to get the body back. Consumers that don't know them see
+# a base64 string or a pointer instead of JSON, so they are only set when the producer is configured to.
+CONTENT_ENCODING = "contentEncoding"
+PAYLOAD_PATH = "payloadPath"
+
+
+def _string_attribute(value):
+    return {"DataType": "String", "StringValue": value}
+
+
+def _compress(data, encoding):
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor().compress(data)
+    # mtime=0 makes the compressed body deterministic
+    return gzip.compress(data, compresslevel=6, mtime=0)
+
+
+def _decompress(data, encoding):
+    if encoding == "zstd":
+        if zstandard is None:
+            raise ValueError("Received a zstd compressed message but zstandard is not installed")
+        return zstandard.ZstdDecompressor().decompress(data)
+    if encoding == "gzip":
+        return gzip.decompress(data)
+    raise ValueError(f"Unknown message content encoding: {encoding}")
+
+
+def content_encoding(encoding=SQS_COMPRESSION):
+    """
+    The compression used for message bodies: zstd needs the zstandard package, without it gzip is used.
+    The nodejs worker only decodes gzip, so queues it consumes are never sent zstd, see DbOperationsSQS.
+
+    Args:
+        encoding (str, optional): "gzip", "zstd" or "" (no compression). Defaults to SQS_COMPRESSION.
+    """
+    if encoding == "zstd" and zstandard is None:
+        return "gzip"
+    if encoding not in ("", "gzip", "zstd"):
+        raise ValueError(f"Unknown message content encoding: {encoding}")
+    return encoding
+
+
+def encode_payload(
+    body,
+    encoding=SQS_COMPRESSION,
+    min_bytes=SQS_COMPRESSION_MIN_BYTES,
+    claim_check_dir=SQS_CLAIM_CHECK_DIR,
+    max_bytes=SQS_MAX_MESSAGE_BYTES,
+):
+    """
+    Prepare an encoded message body for sending.
+    Bodies of at least min_bytes are compressed and base64 encoded. If the body is still larger than max_bytes
+    and a claim check directory is configured, it is written there and the message only carries its path.
+
+    Args:
+        body (str): the JSON encoded body
+        encoding (str, optional): "gzip", "zstd" or "" (no compression). Defaults to SQS_COMPRESSION.
+        min_bytes (int, optional): smallest body that is compressed. Defaults to SQS_COMPRESSION_MIN_BYTES.
+        claim_check_dir (str, optional): where oversized bodies are stored. Defaults to SQS_CLAIM_CHECK_DIR.
+        max_bytes (int, optional): largest body sent inline. Defaults to SQS_MAX_MESSAGE_BYTES.
+
+    Returns:
+        tuple: (body, attributes) to send, attributes are the message attributes to add
+    """
+    encoding = content_encoding(encoding)
+    attributes = {}
+    data = body.encode("utf-8")
+
+    if encoding and len(data) >= min_bytes:
+        data = _compress(data, encoding)
+        attributes[CONTENT_ENCODING] = _string_attribute(encoding)
+        body = base64.b64encode(data).decode("ascii")
+
+    # SQS limits the size of a message in bytes, which is more than its length for non-ASCII bodies
+    if claim_check_dir and len(body.encode("utf-8")) > max_bytes:
+        os.makedirs(claim_check_dir, exist_ok=True)
+        path = os.path.join(claim_check_dir, f"{uuid4()}.payload")
+        with open(path, "wb") as f:
+            f.write(data)
+        attributes[PAYLOAD_PATH] = _string_attribute(path)
+        body = json.dumps({PAYLOAD_PATH: path})
+
+    return body, attributes
+
+
+def payload_path(message):
+    """
+    Path of the claim checked body of a received message, None when the body was sent inline.
+
+    Args:
+        message (dict): the received message
+    """
+    attribute = (message.get("MessageAttributes") or {}).get(PAYLOAD_PATH)
+    return attribute["StringValue"] if attribute else None
+
+
+def remove_payload(path):
+    """
+    Remove a claim checked body, once its message was deleted from the queue.
+
+    Args:
+        path (str): path of the body, as returned by payload_path
+    """
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.warning(f"Could not remove the claim checked message body {path}: {e}")
+
+
+def decode_payload(message):
+    """
+    The JSON encoded body of a received message, decompressed and read from the claim check store if needed.
+
+    Args:
+        message (dict): the received message
+
+    Returns:
+        str: the body
+    """
+    attributes = message.get("MessageAttributes") or {}
+    encoding = attributes.get(CONTENT_ENCODING, {}).get("StringValue")
+    path = payload_path(message)
+
+    if path:
+        with open(path, "rb") as f:
+            data = f.read()
+    elif encoding:
+        data = base64.b64decode(message["Body"])
+    else:
+        return message["Body"]
+
+    if encoding:
+        data = _decompress(data, encoding)
+    return data.decode("utf-8")
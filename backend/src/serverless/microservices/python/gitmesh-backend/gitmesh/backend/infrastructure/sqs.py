@@ -1,11 +1,25 @@
 import boto3
 import os
+import time
 from uuid import uuid1 as uuid
 import json
 from gitmesh.backend.infrastructure.logging import get_logger
+from gitmesh.backend.infrastructure.memory_sqs import MemorySQSClient
+from gitmesh.backend.infrastructure.payloads import (
+    content_encoding,
+    decode_payload,
+    encode_payload,
+    payload_path,
+    remove_payload,
+)
 
 from gitmesh.backend.infrastructure.config import KUBE_MODE, IS_DEV_ENV, SQS_ENDPOINT_URL, SQS_REGION, \
-    SQS_SECRET_ACCESS_KEY, SQS_ACCESS_KEY_ID
+    SQS_SECRET_ACCESS_KEY, SQS_ACCESS_KEY_ID, SQS_MAX_BATCH_BYTES, SQS_BACKEND, SQS_COMPRESSION
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 logger = get_logger(__name__)
 
@@ -18,23 +32,48 @@ def string_converter(o):
     return o.__str__()
 
 
+def encode_body(body):
+    """
+    Encode a message body to a JSON string.
+    orjson is used when it is installed: it serializes UUIDs and datetimes natively, datetimes in ISO 8601 format,
+    and only calls string_converter for the other types, such as Decimal. Bodies orjson can't encode, like integers
+    above 64 bits, are encoded with the standard library.
+
+    Args:
+        body (dict): the body of the message.
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(body, default=string_converter, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+        except orjson.JSONEncodeError:
+            pass
+    return json.dumps(body, default=string_converter)
+
+
 class SQS:
     """
     Class to handle SQS requests. Can send and recieve messages.
     """
 
-    def __init__(self, sqs_url):
+    def __init__(self, sqs_url, compression=SQS_COMPRESSION):
         """
         Initialise class to handle SQS requests.
 
         Args:
             sqs_url (str): SQS url.
+            compression (str, optional): compression of the message bodies sent, "gzip", "zstd" or "" (none).
+                                         Defaults to SQS_COMPRESSION.
         """
         self.sqs_url = sqs_url
+        self.compression = content_encoding(compression)
+        # Claim checked bodies of the received messages by receipt handle, removed once the message is deleted
+        self.payload_paths = {}
         # Otherwise from the environment files.
 
+        if SQS_BACKEND == "memory":
+            self.sqs = MemorySQSClient()
         # TODO-kube
-        if KUBE_MODE:
+        elif KUBE_MODE:
             if SQS_ENDPOINT_URL:
                 self.sqs = boto3.client("sqs",
                                         endpoint_url=SQS_ENDPOINT_URL,
@@ -80,7 +119,9 @@ class SQS:
             attributes = {}
 
         if type(body) is not str:
-            body = json.dumps(body, default=string_converter)
+            body = encode_body(body)
+        body, payload_attributes = encode_payload(body, encoding=self.compression)
+        attributes = {**attributes, **payload_attributes}
         return self.sqs.send_message(
             QueueUrl=self.sqs_url,
             MessageAttributes=attributes,
@@ -89,6 +130,61 @@ class SQS:
             MessageDeduplicationId=deduplicationId,
         )
 
+    def send_message_batch(self, entries, max_retries=3):
+        """
+        Send many messages to the queue using SendMessageBatch.
+        Entries are grouped by up to 10 messages and SQS_MAX_BATCH_BYTES per request.
+        Entries that fail on the SQS side are retried with an exponential backoff.
+
+        Args:
+            entries ([dict]): messages to send, as dicts with body, id (message group) and deduplicationId
+            max_retries (int, optional): how many times failed entries are retried. Defaults to 3.
+
+        Returns:
+            int: number of messages sent
+        """
+        batches = []
+        batch = []
+        batch_size = 0
+        for entry in entries:
+            body = entry["body"] if type(entry["body"]) is str else encode_body(entry["body"])
+            body, payload_attributes = encode_payload(body, encoding=self.compression)
+            size = len(body.encode("utf-8"))
+            if batch and (len(batch) == 10 or batch_size + size > SQS_MAX_BATCH_BYTES):
+                batches.append(batch)
+                batch = []
+                batch_size = 0
+            batch.append(
+                {
+                    "Id": str(len(batch)),
+                    "MessageBody": body,
+                    "MessageAttributes": {**(entry.get("attributes") or {}), **payload_attributes},
+                    "MessageGroupId": entry["id"],
+                    "MessageDeduplicationId": entry["deduplicationId"],
+                }
+            )
+            batch_size += size
+        if batch:
+            batches.append(batch)
+
+        for batch in batches:
+            for attempt in range(max_retries + 1):
+                response = self.sqs.send_message_batch(QueueUrl=self.sqs_url, Entries=batch)
+                failed = response.get("Failed", [])
+                if not failed:
+                    break
+
+                sender_faults = [f for f in failed if f.get("SenderFault")]
+                if sender_faults or attempt == max_retries:
+                    raise Exception(f"Error while sending messages to {self.sqs_url}: {failed}")
+
+                logger.warning(f"Retrying {len(failed)} messages that failed to be sent to {self.sqs_url}")
+                failed_ids = {f["Id"] for f in failed}
+                batch = [e for e in batch if e["Id"] in failed_ids]
+                time.sleep(0.1 * 2**attempt)
+
+        return len(entries)
+
     def receive_message(self, delete=True, wait_time_seconds=0, visibility_timeout=60):
         """
         Receive a message from the queue.
@@ -112,15 +208,64 @@ class SQS:
         if "Messages" in response.keys():
 
             message = response["Messages"][0]
+            message["Body"] = self._decode(message)
             receipt_handle = message["ReceiptHandle"]
 
             if delete:
                 # Delete received message from queue
-                self.sqs.delete_message(QueueUrl=self.sqs_url, ReceiptHandle=receipt_handle)
+                self.delete_message(receipt_handle)
             return message
 
         return None
 
+    def receive_messages(self, max_number=10, wait_time_seconds=0, visibility_timeout=60):
+        """
+        Receive up to max_number messages from the queue, without deleting them.
+
+        Args:
+            max_number (int, optional): maximum number of messages to receive, at most 10. Defaults to 10.
+            wait_time_seconds (int, optional): how long should the request wait for a queue message.
+            visibility_timeout (int, optional): how long should the messages be invisible to other receivers
+
+        Returns:
+            [dict]: The fetched messages.
+        """
+        response = self.sqs.receive_message(
+            QueueUrl=self.sqs_url,
+            MaxNumberOfMessages=max_number,
+            MessageAttributeNames=["All"],
+            VisibilityTimeout=visibility_timeout,
+            WaitTimeSeconds=wait_time_seconds,
+        )
+        messages = response.get("Messages", [])
+        for message in messages:
+            message["Body"] = self._decode(message)
+        return messages
+
+    def _decode(self, message):
+        path = payload_path(message)
+        if path:
+            self.payload_paths[message["ReceiptHandle"]] = path
+        return decode_payload(message)
+
+    def _remove_payloads(self, receipt_handles):
+        for receipt_handle in receipt_handles:
+            path = self.payload_paths.pop(receipt_handle, None)
+            if path:
+                remove_payload(path)
+
+    def change_message_visibility(self, receipt_handle, visibility_timeout):
+        """
+        Change how long a received message stays invisible to other receivers, counting from now.
+
+        Args:
+            receipt_handle: (string, required): receipt handle from the SQS message
+            visibility_timeout (int): new visibility timeout in seconds
+        """
+        self.sqs.change_message_visibility(
+            QueueUrl=self.sqs_url, ReceiptHandle=receipt_handle, VisibilityTimeout=visibility_timeout
+        )
+
     def delete_message(self, receipt_handle):
         """
         Delete a message from the queue.
@@ -130,6 +275,44 @@ class SQS:
         Returns: None
         """
         self.sqs.delete_message(QueueUrl=self.sqs_url, ReceiptHandle=receipt_handle)
+        self._remove_payloads([receipt_handle])
+
+    def delete_message_batch(self, receipt_handles, max_retries=3):
+        """
+        Delete many messages from the queue using DeleteMessageBatch, 10 messages per request.
+        Entries that fail on the SQS side are retried with an exponential backoff.
+
+        Args:
+            receipt_handles ([str]): receipt handles from the SQS messages
+            max_retries (int, optional): how many times failed entries are retried. Defaults to 3.
+
+        Returns:
+            int: number of messages deleted
+        """
+        for start in range(0, len(receipt_handles), 10):
+            batch = [
+                {"Id": str(i), "ReceiptHandle": receipt_handle}
+                for i, receipt_handle in enumerate(receipt_handles[start : start + 10])
+            ]
+            deleted = [entry["ReceiptHandle"] for entry in batch]
+            for attempt in range(max_retries + 1):
+                response = self.sqs.delete_message_batch(QueueUrl=self.sqs_url, Entries=batch)
+                failed = response.get("Failed", [])
+                if not failed:
+                    break
+
+                sender_faults = [f for f in failed if f.get("SenderFault")]
+                if sender_faults or attempt == max_retries:
+                    raise Exception(f"Error while deleting messages from {self.sqs_url}: {failed}")
+
+                logger.warning(f"Retrying {len(failed)} messages that failed to be deleted from {self.sqs_url}")
+                failed_ids = {f["Id"] for f in failed}
+                batch = [e for e in batch if e["Id"] in failed_ids]
+                time.sleep(0.1 * 2**attempt)
+
+            self._remove_payloads(deleted)
+
+        return len(receipt_handles)
 
     @staticmethod
     def make_id():
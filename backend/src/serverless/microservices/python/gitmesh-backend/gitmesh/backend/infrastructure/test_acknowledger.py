@@ -0,0 +1,32 @@
+import time
+
+from gitmesh.backend.infrastructure.acknowledger import Acknowledger
+
+
+class RecordingQueue:
+    def __init__(self):
+        self.batches = []
+
+    def delete_message_batch(self, receipt_handles):
+        self.batches.append(receipt_handles)
+        return len(receipt_handles)
+
+
+def test_flush_on_size():
+    queue = RecordingQueue()
+    with Acknowledger(queue, max_batch=3, max_delay=60) as acknowledger:
+        for i in range(4):
+            acknowledger.ack(str(i))
+            time.sleep(0.05)
+        assert queue.batches == [["0", "1", "2"]]
+    # The pending messages are deleted when the acknowledger stops
+    assert queue.batches == [["0", "1", "2"], ["3"]]
+
+
+def test_flush_on_time():
+    queue = RecordingQueue()
+    with Acknowledger(queue, max_batch=10, max_delay=0.1) as acknowledger:
+        acknowledger.ack("0")
+        acknowledger.ack("1")
+        time.sleep(0.3)
+        assert queue.batches == [["0", "1"]]
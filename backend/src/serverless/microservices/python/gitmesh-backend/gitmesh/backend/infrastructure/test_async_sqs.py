@@ -0,0 +1,177 @@
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+
+from gitmesh.backend.infrastructure.async_sqs import AsyncSQS
+from gitmesh.backend.infrastructure.memory_sqs import get_queue
+
+
+def send(sqs, n, groups=1):
+    for i in range(n):
+        sqs.send_message({"i": i}, str(i % groups), str(i))
+
+
+def number(message):
+    return json.loads(message["Body"])["i"]
+
+
+def test_send_many_keeps_the_order_of_every_group(make_sqs):
+    sqs = make_sqs()
+    async_sqs = AsyncSQS(sqs, max_concurrency=3)
+    send_message_batch = sqs.send_message_batch
+    lock = threading.Lock()
+    in_flight = 0
+    max_in_flight = 0
+
+    def slow_send_message_batch(entries, max_retries=3):
+        nonlocal in_flight, max_in_flight
+        with lock:
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+        time.sleep(0.02)
+        try:
+            return send_message_batch(entries, max_retries)
+        finally:
+            with lock:
+                in_flight -= 1
+
+    sqs.send_message_batch = slow_send_message_batch
+    entries = [dict(body={"i": i}, id=str(i % 5), deduplicationId=str(i)) for i in range(95)]
+
+    sent = asyncio.run(async_sqs.send_many(entries, batch_size=4))
+    async_sqs.close()
+
+    assert sent == 95
+    assert 1 < max_in_flight <= 3
+    received = []
+    while True:
+        messages = sqs.receive_messages(max_number=10, visibility_timeout=0)
+        if not messages:
+            break
+        received.extend(messages)
+        sqs.delete_message_batch([message["ReceiptHandle"] for message in messages])
+    assert sorted(number(message) for message in received) == list(range(95))
+    for group in range(5):
+        in_group = [number(message) for message in received if number(message) % 5 == group]
+        assert in_group == sorted(in_group)
+
+
+def test_consume_processes_every_message(make_sqs):
+    sqs = make_sqs()
+    send(sqs, 20, groups=5)
+    async_sqs = AsyncSQS(sqs)
+    processed = []
+    running = 0
+    max_running = 0
+
+    async def main():
+        stop = asyncio.Event()
+
+        async def handler(message):
+            nonlocal running, max_running
+            running += 1
+            max_running = max(max_running, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            processed.append(number(message))
+            await async_sqs.delete_message(message["ReceiptHandle"])
+            if len(processed) == 20:
+                stop.set()
+
+        await asyncio.wait_for(async_sqs.consume(handler, concurrency=3, wait_time_seconds=0.1, stop=stop), 10)
+
+    asyncio.run(main())
+    async_sqs.close()
+
+    assert len(processed) == 20
+    assert max_running <= 3
+    assert len(get_queue(sqs.sqs_url)) == 0
+
+
+def test_consume_keeps_going_after_a_failed_handler(make_sqs):
+    sqs = make_sqs()
+    send(sqs, 2, groups=2)
+    async_sqs = AsyncSQS(sqs)
+    processed = []
+
+    async def main():
+        stop = asyncio.Event()
+
+        async def handler(message):
+            if number(message) == 0:
+                raise ValueError("failed")
+            processed.append(number(message))
+            stop.set()
+
+        await asyncio.wait_for(async_sqs.consume(handler, wait_time_seconds=0.1, stop=stop), 10)
+
+    asyncio.run(main())
+    async_sqs.close()
+
+    assert processed == [1]
+    # The failed message is not deleted, it is received again once its visibility timeout expires
+    assert len(get_queue(sqs.sqs_url)) == 2
+
+
+def test_stop_drains_the_messages_being_processed(make_sqs):
+    sqs = make_sqs()
+    send(sqs, 1)
+    async_sqs = AsyncSQS(sqs)
+    processed = []
+
+    async def main():
+        stop = asyncio.Event()
+        started = asyncio.Event()
+
+        async def handler(message):
+            started.set()
+            await asyncio.sleep(0.2)
+            processed.append(number(message))
+            await async_sqs.delete_message(message["ReceiptHandle"])
+
+        consumer = asyncio.ensure_future(async_sqs.consume(handler, wait_time_seconds=0.1, stop=stop))
+        await started.wait()
+        stop.set()
+        await asyncio.wait_for(consumer, 10)
+
+    asyncio.run(main())
+    async_sqs.close()
+
+    assert processed == [0]
+    assert len(get_queue(sqs.sqs_url)) == 0
+
+
+def test_cancel_cancels_the_handlers(make_sqs):
+    sqs = make_sqs()
+    send(sqs, 2, groups=2)
+    async_sqs = AsyncSQS(sqs)
+    cancelled = []
+
+    async def main():
+        started = asyncio.Event()
+
+        async def handler(message):
+            started.set()
+            try:
+                await asyncio.sleep(60)
+            except asyncio.CancelledError:
+                cancelled.append(number(message))
+                raise
+
+        consumer = asyncio.ensure_future(async_sqs.consume(handler, concurrency=2, wait_time_seconds=0.1))
+        await started.wait()
+        await asyncio.sleep(0.1)
+        consumer.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await asyncio.wait_for(consumer, 10)
+        # The handlers are cancelled before consume returns, not left running in the background
+        assert sorted(cancelled) == [0, 1]
+
+    asyncio.run(main())
+    async_sqs.close()
+
+    # Nothing was deleted, the messages are received again once their visibility timeout expires
+    assert len(get_queue(sqs.sqs_url)) == 2
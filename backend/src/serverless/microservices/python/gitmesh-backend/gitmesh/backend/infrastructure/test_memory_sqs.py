@@ -0,0 +1,62 @@
+import time
+
+from gitmesh.backend.infrastructure.memory_sqs import MemoryQueue, MemorySQSClient
+
+
+def test_message_groups_are_received_in_order():
+    queue = MemoryQueue()
+    for i in range(3):
+        queue.send(f"a{i}", None, "a", f"a{i}")
+        queue.send(f"b{i}", None, "b", f"b{i}")
+
+    # One message per group is in flight at a time
+    first = queue.receive(10, 0, 60)
+    assert [m.body for m in first] == ["a0", "b0"]
+    assert queue.receive(10, 0, 60) == []
+
+    queue.delete(first[0].receipt_handle)
+    assert [m.body for m in queue.receive(10, 0, 60)] == ["a1"]
+
+
+def test_deduplication():
+    queue = MemoryQueue()
+    assert queue.send("x", None, "a", "same") is not None
+    assert queue.send("y", None, "a", "same") is None
+    assert len(queue) == 1
+
+
+def test_visibility_timeout():
+    queue = MemoryQueue()
+    queue.send("x", None, "a", "1")
+
+    received = queue.receive(1, 0, 0.05)[0]
+    old_receipt_handle = received.receipt_handle
+    assert queue.receive(1, 0, 60) == []
+
+    # Waiting receivers get the message once it is visible again, with a new receipt handle
+    start = time.monotonic()
+    again = queue.receive(1, 1, 60)
+    assert time.monotonic() - start < 0.5
+    assert again[0].body == "x" and again[0].receive_count == 2
+
+    # The stale receipt handle does not delete the message
+    queue.delete(old_receipt_handle)
+    assert len(queue) == 1
+    queue.delete(again[0].receipt_handle)
+    assert len(queue) == 0
+
+
+def test_client():
+    client = MemorySQSClient()
+    entries = [
+        {"Id": str(i), "MessageBody": str(i), "MessageGroupId": str(i % 2), "MessageDeduplicationId": str(i)}
+        for i in range(4)
+    ]
+    assert len(client.send_message_batch(QueueUrl="test_client", Entries=entries)["Successful"]) == 4
+
+    messages = client.receive_message(QueueUrl="test_client", MaxNumberOfMessages=10)["Messages"]
+    assert [m["Body"] for m in messages] == ["0", "1"]
+    for message in messages:
+        client.delete_message(QueueUrl="test_client", ReceiptHandle=message["ReceiptHandle"])
+    messages = client.receive_message(QueueUrl="test_client", MaxNumberOfMessages=10)["Messages"]
+    assert [m["Body"] for m in messages] == ["2", "3"]
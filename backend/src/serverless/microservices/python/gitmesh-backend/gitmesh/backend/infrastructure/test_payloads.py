@@ -0,0 +1,51 @@
+import json
+import os
+
+import pytest
+
+from gitmesh.backend.infrastructure.payloads import (
+    CONTENT_ENCODING,
+    PAYLOAD_PATH,
+    decode_payload,
+    encode_payload,
+)
+
+BODY = json.dumps({"records": [{"id": str(i), "update": {"score": i % 10}} for i in range(2000)]})
+
+
+def test_small_bodies_are_sent_as_they_are():
+    body, attributes = encode_payload('{"a": 1}', encoding="gzip", min_bytes=1024, claim_check_dir=None)
+    assert body == '{"a": 1}'
+    assert attributes == {}
+
+
+@pytest.mark.parametrize("encoding", ["gzip", "zstd"])
+def test_compression(encoding):
+    body, attributes = encode_payload(BODY, encoding=encoding, min_bytes=1024, claim_check_dir=None)
+    assert len(body) < len(BODY) / 4
+    assert attributes[CONTENT_ENCODING]["StringValue"] in ("gzip", "zstd")
+    assert decode_payload({"Body": body, "MessageAttributes": attributes}) == BODY
+
+
+def test_claim_check(tmp_path):
+    body, attributes = encode_payload(BODY, encoding="gzip", claim_check_dir=str(tmp_path), max_bytes=1024)
+    path = attributes[PAYLOAD_PATH]["StringValue"]
+    assert json.loads(body) == {PAYLOAD_PATH: path}
+    assert os.path.dirname(path) == str(tmp_path)
+    assert decode_payload({"Body": body, "MessageAttributes": attributes}) == BODY
+
+
+def test_claim_check_without_compression(tmp_path):
+    body, attributes = encode_payload(BODY, encoding="", claim_check_dir=str(tmp_path), max_bytes=1024)
+    assert CONTENT_ENCODING not in attributes
+    assert decode_payload({"Body": body, "MessageAttributes": attributes}) == BODY
+
+
+def test_claim_check_counts_bytes(tmp_path):
+    # Shorter than max_bytes in characters but longer in bytes
+    body = json.dumps({"title": "é" * 600}, ensure_ascii=False)
+    assert len(body) < 1024 < len(body.encode("utf-8"))
+
+    sent, attributes = encode_payload(body, encoding="", claim_check_dir=str(tmp_path), max_bytes=1024)
+    assert PAYLOAD_PATH in attributes
+    assert decode_payload({"Body": sent, "MessageAttributes": attributes}) == body
@@ -0,0 +1,154 @@
+import json
+import os
+from datetime import datetime, timezone
+from decimal import Decimal
+from uuid import UUID
+
+import pytest
+
+from gitmesh.backend.infrastructure import db_operations_sqs as db_operations_sqs_module
+from gitmesh.backend.infrastructure import sqs as sqs_module
+from gitmesh.backend.infrastructure.db_operations_sqs import DbOperationsSQS
+from gitmesh.backend.infrastructure.payloads import CONTENT_ENCODING, encode_payload
+from gitmesh.backend.infrastructure.sqs import SQS, encode_body
+
+
+class RecordingClient:
+    """
+    SQS client that records the SendMessageBatch requests and fails the entries listed in failures,
+    one dict of Id -> SenderFault per request.
+    """
+
+    def __init__(self, failures=()):
+        self.requests = []
+        self.failures = list(failures)
+
+    def send_message_batch(self, QueueUrl, Entries):
+        self.requests.append([entry["MessageBody"] for entry in Entries])
+        failures = self.failures.pop(0) if self.failures else {}
+        return {
+            "Successful": [{"Id": e["Id"]} for e in Entries if e["Id"] not in failures],
+            "Failed": [{"Id": e["Id"], "SenderFault": failures[e["Id"]]} for e in Entries if e["Id"] in failures],
+        }
+
+
+def entries(n, size=10):
+    return [dict(body=str(i).rjust(size, "x"), id="group", deduplicationId=str(i)) for i in range(n)]
+
+
+def test_send_message_batch_splits_by_count(make_sqs):
+    client = RecordingClient()
+    assert make_sqs(client).send_message_batch(entries(25)) == 25
+    assert [len(request) for request in client.requests] == [10, 10, 5]
+
+
+def test_send_message_batch_splits_by_bytes(monkeypatch, make_sqs):
+    monkeypatch.setattr(sqs_module, "SQS_MAX_BATCH_BYTES", 35)
+    client = RecordingClient()
+    make_sqs(client).send_message_batch(entries(7))
+    # Three bodies of 10 bytes fit in 35 bytes, a fourth doesn't
+    assert [len(request) for request in client.requests] == [3, 3, 1]
+
+
+def test_send_message_batch_retries_failed_entries(monkeypatch, make_sqs):
+    monkeypatch.setattr(sqs_module.time, "sleep", lambda seconds: None)
+    client = RecordingClient(failures=[{"1": False, "3": False}])
+    assert make_sqs(client).send_message_batch(entries(5)) == 5
+    # Only the entries that failed on the SQS side are sent again
+    assert client.requests[1] == [entries(5)[1]["body"], entries(5)[3]["body"]]
+
+
+def test_send_message_batch_does_not_retry_sender_faults(monkeypatch, make_sqs):
+    monkeypatch.setattr(sqs_module.time, "sleep", lambda seconds: None)
+    client = RecordingClient(failures=[{"1": True, "3": False}])
+    with pytest.raises(Exception, match="Error while sending messages"):
+        make_sqs(client).send_message_batch(entries(5))
+    assert len(client.requests) == 1
+
+
+def test_send_message_batch_gives_up_after_max_retries(monkeypatch, make_sqs):
+    monkeypatch.setattr(sqs_module.time, "sleep", lambda seconds: None)
+    client = RecordingClient(failures=[{"0": False}] * 3)
+    with pytest.raises(Exception, match="Error while sending messages"):
+        make_sqs(client).send_message_batch(entries(1), max_retries=2)
+    assert len(client.requests) == 3
+
+
+def test_encode_body():
+    member_id = UUID("5c5a9a5e-3d5e-4c36-9d5a-2f8f4e7b9f10")
+    body = {
+        "id": member_id,
+        "score": Decimal("1.50"),
+        "timestamp": datetime(2023, 1, 2, 3, 4, 5, tzinfo=timezone.utc),
+        "levels": {1: "low", 2: "high"},
+    }
+    decoded = json.loads(encode_body(body))
+    assert decoded["id"] == str(member_id)
+    assert decoded["score"] == "1.50"
+    assert datetime.fromisoformat(decoded["timestamp"]) == body["timestamp"]
+    assert decoded["levels"] == {"1": "low", "2": "high"}
+
+
+def test_encode_body_big_integers():
+    assert json.loads(encode_body({"n": 2**70})) == {"n": 2**70}
+
+
+def test_pack():
+    records = [{"id": str(i), "update": {"score": i}} for i in range(100)]
+    bodies = DbOperationsSQS.pack({"tenant_id": "t", "operation": "update_members"}, records, max_bytes=1000)
+    assert all(len(body) <= 1000 for body in bodies)
+    assert [r for body in bodies for r in json.loads(body)["records"]] == records
+
+
+def test_compression_is_set_per_queue(monkeypatch):
+    monkeypatch.setattr(sqs_module, "SQS_BACKEND", "memory")
+    monkeypatch.setattr(db_operations_sqs_module, "SQS_COMPRESSION", "zstd")
+    assert SQS("queue", compression="gzip").compression == "gzip"
+    # The nodejs worker can't decode zstd
+    monkeypatch.setattr(db_operations_sqs_module, "KUBE_MODE", True)
+    assert DbOperationsSQS().compression == "gzip"
+    # The dbOperations lambda handler can't decode compressed bodies at all
+    monkeypatch.setattr(db_operations_sqs_module, "KUBE_MODE", False)
+    assert DbOperationsSQS().compression == ""
+
+
+@pytest.mark.parametrize("batch", [False, True])
+def test_claim_checked_bodies_are_removed_once_deleted(tmp_path, batch, make_sqs):
+    sqs = make_sqs()
+    body = json.dumps({"records": list(range(1000))})
+    for i in range(2):
+        claim_checked, attributes = encode_payload(body, encoding="gzip", claim_check_dir=str(tmp_path), max_bytes=100)
+        sqs.sqs.send_message(
+            QueueUrl=sqs.sqs_url,
+            MessageBody=claim_checked,
+            MessageGroupId=str(i),
+            MessageDeduplicationId=str(i),
+            MessageAttributes=attributes,
+        )
+
+    messages = sqs.receive_messages()
+    assert [message["Body"] for message in messages] == [body, body]
+    assert len(os.listdir(tmp_path)) == 2
+
+    if batch:
+        sqs.delete_message_batch([messages[0]["ReceiptHandle"]])
+    else:
+        sqs.delete_message(messages[0]["ReceiptHandle"])
+    # Only the body of the deleted message is removed, the other one may still be received again
+    assert len(os.listdir(tmp_path)) == 1
+    assert sqs.payload_paths.keys() == {messages[1]["ReceiptHandle"]}
+
+
+def test_inline_bodies_are_not_tracked(make_sqs):
+    sqs = make_sqs()
+    body, attributes = encode_payload(json.dumps({"records": list(range(1000))}), encoding="gzip", claim_check_dir=None)
+    assert CONTENT_ENCODING in attributes
+    sqs.sqs.send_message(
+        QueueUrl=sqs.sqs_url,
+        MessageBody=body,
+        MessageGroupId="0",
+        MessageDeduplicationId="0",
+        MessageAttributes=attributes,
+    )
+    sqs.delete_message(sqs.receive_message(delete=False)["ReceiptHandle"])
+    assert sqs.payload_paths == {}
@@ -0,0 +1,54 @@
+import threading
+
+from gitmesh.backend.infrastructure.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+class VisibilityHeartbeat:
+    """
+    Keep a received SQS message invisible to other receivers while it is being processed.
+    A background thread extends the visibility timeout of the message every half timeout until stopped.
+
+    Usage:
+        with VisibilityHeartbeat(sqs, receipt_handle, 120):
+            process(message)
+        sqs.delete_message(receipt_handle)
+    """
+
+    def __init__(self, sqs, receipt_handle, visibility_timeout):
+        """
+        Initialise the heartbeat of a message.
+
+        Args:
+            sqs (SQS): the queue the message was received from
+            receipt_handle (str): receipt handle from the SQS message
+            visibility_timeout (int): visibility timeout in seconds set on every beat
+        """
+        self.sqs = sqs
+        self.receipt_handle = receipt_handle
+        self.visibility_timeout = visibility_timeout
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._beat, daemon=True)
+
+    def _beat(self):
+        while not self._stopped.wait(self.visibility_timeout / 2):
+            try:
+                self.sqs.change_message_visibility(self.receipt_handle, self.visibility_timeout)
+            except Exception as e:
+                logger.warning(f"Could not extend the visibility timeout of a message: {e}")
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+        return False
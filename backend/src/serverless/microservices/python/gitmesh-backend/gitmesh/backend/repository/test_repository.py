@@ -95,3 +95,23 @@ def test_find_community_member_order_by_createdAt(api: "Repository"):
     members = api.find_all(Member, query={"type": "member"}, order={Member.createdAt: False})
 
     assert members[0].createdAt >= members[len(members) - 1].createdAt
+
+
+def test_find_all_fields(api: "Repository"):
+    """Tests the find all function fetching only some columns of the Members"""
+    members = api.find_all(Member)
+    result = api.find_all(Member, fields=["id", "score", "attributes.isTeamMember.default"])
+
+    assert len(result) == len(members)
+    assert {row.id for row in result} == {member.id for member in members}
+    assert len(result[0]) == 3
+
+
+def test_paginate(api: "Repository"):
+    """Tests walking the Members by pages"""
+    members = api.find_all(Member)
+    pages = list(api.paginate(Member, fields=["id", "score"], page_size=3))
+
+    assert all(len(page) == 3 for page in pages[:-1])
+    ids = [row.id for page in pages for row in page]
+    assert ids == sorted(member.id for member in members)
@@ -15,4 +15,5 @@ setup(
     packages=find_namespace_packages(include=["gitmesh.*"]),
     install_requires=["pyjwt", "python-dotenv", "requests", "cryptography >= 43.0.0",
                       "python-dateutil", "pytz", "SQLAlchemy==1.4.46", "dnspython>=2.4.0", "boto3"],
+    extras_require={"speedups": ["orjson>=3.8"]},
 )
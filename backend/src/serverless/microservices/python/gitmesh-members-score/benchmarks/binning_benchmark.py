@@ -0,0 +1,44 @@
+"""
+Compare the engagement levels clustering methods on synthetic raw member scores.
+
+Usage:
+    python benchmarks/binning_benchmark.py [n_members ...]
+"""
+import sys
+import time
+
+import numpy as np
+
+from gitmesh.members_score import binning
+
+K = 10
+SAMPLE_SIZE = 50000
+
+
+def sse(values, labels):
+    return sum(((values[labels == level] - values[labels == level].mean()) ** 2).sum() for level in np.unique(labels))
+
+
+def main(sizes):
+    rng = np.random.default_rng(0)
+    for n in sizes:
+        # Raw scores are heavy tailed: most members have a handful of activities, a few have a lot
+        values = np.round(rng.lognormal(mean=1.0, sigma=1.5, size=n), 2)
+        # Agreement is measured against the levels of the historic KMeans clustering, fitted on all the values
+        reference, _ = binning.cluster(values, K, method="kmeans")
+        runs = [(method, None) for method in binning.METHODS] + [("ckmeans", SAMPLE_SIZE), ("kmeans", SAMPLE_SIZE)]
+        for method, sample_size in runs:
+            start = time.perf_counter()
+            labels, _ = binning.cluster(values, K, method=method, sample_size=sample_size)
+            elapsed = time.perf_counter() - start
+            if sample_size and n > sample_size:
+                method = f"{method}@{sample_size}"
+            elif sample_size:
+                continue
+
+            agreement = (labels == reference).mean()
+            print(f"n={n:>8} {method:>16}: {elapsed:8.3f}s  sse={sse(values, labels):14.1f}  agreement={agreement:.3f}")
+
+
+if __name__ == "__main__":
+    main([int(n) for n in sys.argv[1:]] or [1_000, 10_000, 100_000, 1_000_000])
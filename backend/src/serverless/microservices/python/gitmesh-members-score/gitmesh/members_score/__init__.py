@@ -1,2 +1,2 @@
 from .members_score import MembersScore  # noqa
-from .worker import members_score_worker  # noqa
\ No newline at end of file
+from .worker import members_score_worker, members_rescore_worker  # noqa
\ No newline at end of file
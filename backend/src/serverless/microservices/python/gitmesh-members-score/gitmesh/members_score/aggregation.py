@@ -0,0 +1,180 @@
+import numpy as np
+
+# Number of days taken into account when scoring members
+WINDOW_DAYS = 365
+
+# Engagement loses 10% of its weight every 30 days. The weights of the first DECAY_TABLE_DAYS day offsets
+# are computed once, and looked up instead of computing a fractional power for every row or action.
+DECAY_TABLE_DAYS = 20 * 365
+DECAY_WEIGHTS = 0.9 ** (np.arange(DECAY_TABLE_DAYS) / 30)
+
+
+def decay_weights(days):
+    """
+    Decay weights 0.9 ** (days / 30) of day offsets.
+
+    Args:
+        days (np.ndarray or int): number of days elapsed, offsets outside of the table (in the future,
+                                  or older than DECAY_TABLE_DAYS) are computed directly
+
+    Returns:
+        np.ndarray or float: the weights
+    """
+    if np.ndim(days) == 0:
+        return float(DECAY_WEIGHTS[days]) if 0 <= days < DECAY_TABLE_DAYS else 0.9 ** (days / 30)
+
+    days = np.asarray(days, dtype=np.int64)
+    weights = DECAY_WEIGHTS[np.clip(days, 0, DECAY_TABLE_DAYS - 1)]
+    outside = (days < 0) | (days >= DECAY_TABLE_DAYS)
+    weights[outside] = 0.9 ** (days[outside] / 30)
+    return weights
+
+
+def window_days(today, window=WINDOW_DAYS):
+    """
+    Day ordinals covered by the scoring window, oldest first.
+
+    Args:
+        today (datetime.date): last day of the window
+        window (int, optional): number of days in the window. Defaults to WINDOW_DAYS.
+
+    Returns:
+        np.ndarray: array of day ordinals (as in datetime.date.toordinal)
+    """
+    end = today.toordinal()
+    return np.arange(end - window + 1, end + 1, dtype=np.int64)
+
+
+def ordinals_to_datetime64(ordinals):
+    """
+    Convert day ordinals (as in datetime.date.toordinal) to numpy days.
+
+    Args:
+        ordinals (np.ndarray): array of day ordinals
+    """
+    return np.datetime64("0001-01-01", "D") + (np.asarray(ordinals, dtype=np.int64) - 1)
+
+
+def monthly_stats(member_idx, days, counts, scores, n_members, today, window=WINDOW_DAYS):
+    """
+    Compute the monthly mean and standard deviation of the daily activity of every member.
+
+    Only the days with activity need to be given. Days of the window without activity count as zero,
+    so the result is the same as zero-filling every (member, day) pair before aggregating.
+    The standard deviation is the sample standard deviation, and 0 for months with a single day in the window.
+
+    Args:
+        member_idx (np.ndarray): index of the member of each daily aggregate, in [0, n_members)
+        days (np.ndarray): day ordinal of each daily aggregate
+        counts (np.ndarray): number of activities of each daily aggregate
+        scores (np.ndarray): summed activity score of each daily aggregate
+        n_members (int): number of members
+        today (datetime.date): last day of the window
+        window (int, optional): number of days in the window. Defaults to WINDOW_DAYS.
+
+    Returns:
+        tuple: (years, months, avg_counts, avg_scores, std_counts, std_scores). years and months describe
+        the calendar months of the window, the other four are (n_members, number of months) matrices.
+    """
+    all_days = window_days(today, window)
+    all_months = ordinals_to_datetime64(all_days).astype("datetime64[M]")
+    first_month = all_months[0]
+    days_per_month = np.bincount((all_months - first_month).astype(np.int64))
+    n_months = len(days_per_month)
+
+    member_idx = np.asarray(member_idx, dtype=np.int64)
+    days = np.asarray(days, dtype=np.int64)
+    in_window = (days >= all_days[0]) & (days <= all_days[-1])
+
+    month_idx = (ordinals_to_datetime64(days[in_window]).astype("datetime64[M]") - first_month).astype(np.int64)
+    cells = member_idx[in_window] * n_months + month_idx
+    size = n_members * n_months
+
+    def _totals(values):
+        values = np.asarray(values, dtype=np.float64)[in_window]
+        total = np.bincount(cells, weights=values, minlength=size).reshape(n_members, n_months)
+        squares = np.bincount(cells, weights=values * values, minlength=size).reshape(n_members, n_months)
+        return total, squares
+
+    avg_counts, std_counts = _mean_std(*_totals(counts), days_per_month)
+    avg_scores, std_scores = _mean_std(*_totals(scores), days_per_month)
+
+    years, months = _calendar(first_month, n_months)
+    return years, months, avg_counts, avg_scores, std_counts, std_scores
+
+
+def monthly_stats_from_totals(
+    member_idx, months, counts, counts_squares, scores, scores_squares, n_members, today, window=WINDOW_DAYS
+):
+    """
+    Compute the monthly mean and standard deviation of the daily activity of every member,
+    from monthly totals and sums of squares of the daily activity.
+
+    The months are calendar aligned: the first month of the window is taken as a whole, the current month
+    up to today. Days without activity count as zero, and the standard deviation is the sample standard deviation.
+
+    Args:
+        member_idx (np.ndarray): index of the member of each monthly total, in [0, n_members)
+        months (np.ndarray): first day of the month of each monthly total, as numpy days or dates
+        counts (np.ndarray): number of activities of each monthly total
+        counts_squares (np.ndarray): sum of the squared daily number of activities of each monthly total
+        scores (np.ndarray): summed activity score of each monthly total
+        scores_squares (np.ndarray): sum of the squared daily summed activity score of each monthly total
+        n_members (int): number of members
+        today (datetime.date): last day of the window
+        window (int, optional): number of days in the window. Defaults to WINDOW_DAYS.
+
+    Returns:
+        tuple: (years, months, avg_counts, avg_scores, std_counts, std_scores), see monthly_stats
+    """
+    first_month = ordinals_to_datetime64(window_days(today, window)[0]).astype("datetime64[M]")
+    n_months = int(np.datetime64(today, "M") - first_month) + 1
+    calendar = first_month + np.arange(n_months)
+    days_per_month = ((calendar + 1).astype("datetime64[D]") - calendar.astype("datetime64[D]")).astype(np.int64)
+    days_per_month[-1] = today.day
+
+    month_idx = (np.asarray(months, dtype="datetime64[D]").astype("datetime64[M]") - first_month).astype(np.int64)
+    in_window = (month_idx >= 0) & (month_idx < n_months)
+    cells = np.asarray(member_idx, dtype=np.int64)[in_window] * n_months + month_idx[in_window]
+    size = n_members * n_months
+
+    def _sum(values):
+        values = np.asarray(values, dtype=np.float64)[in_window]
+        return np.bincount(cells, weights=values, minlength=size).reshape(n_members, n_months)
+
+    avg_counts, std_counts = _mean_std(_sum(counts), _sum(counts_squares), days_per_month)
+    avg_scores, std_scores = _mean_std(_sum(scores), _sum(scores_squares), days_per_month)
+
+    years, months = _calendar(first_month, n_months)
+    return years, months, avg_counts, avg_scores, std_counts, std_scores
+
+
+def _mean_std(total, squares, days_per_month):
+    mean = total / days_per_month
+    var = (squares - total * mean) / np.maximum(days_per_month - 1, 1)
+    return mean, np.sqrt(np.clip(var, 0, None))
+
+
+def _calendar(first_month, n_months):
+    calendar = first_month + np.arange(n_months)
+    years = calendar.astype("datetime64[Y]").astype(np.int64) + 1970
+    months = calendar.astype(np.int64) % 12 + 1
+    return years, months
+
+
+def monthly_rows(member_ids, stats):
+    """
+    Rows of monthly engagement, in the shape taken by MembersScore.calculate_member_score:
+    (memberId, avg daily activities, avg daily score, stddev daily activities, stddev daily score, month, year)
+    Scoring works on the stats matrices directly, the rows are only used to check it against the per row formula.
+
+    Args:
+        member_ids ([str]): the members, in the order of their index in the stats
+        stats (tuple): monthly stats of the members, as returned by monthly_stats
+    """
+    years, months, avg_counts, avg_scores, std_counts, std_scores = stats
+    return [
+        (member_id, avg_counts[i, j], avg_scores[i, j], std_counts[i, j], std_scores[i, j], months[j], years[j])
+        for i, member_id in enumerate(member_ids)
+        for j in range(len(months))
+    ]
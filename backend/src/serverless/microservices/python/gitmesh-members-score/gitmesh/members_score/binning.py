@@ -0,0 +1,271 @@
+import numpy as np
+
+
+def _ckmeans_centers(x, k):
+    """
+    Optimal 1-D k-means clustering of sorted values (Ckmeans.1d.dp, Wang & Song 2011).
+
+    The dynamic program D[m][i] = min_j D[m - 1][j - 1] + cost(j, i) is solved with the divide and conquer
+    optimisation, which holds because the optimal j is monotone in i. Every level of the recursion is computed
+    in one vectorized pass, so a layer costs O(n log n) and the whole clustering O(k n log n).
+
+    Args:
+        x (np.ndarray): sorted values
+        k (int): number of clusters, at most the number of distinct values
+
+    Returns:
+        np.ndarray: the k cluster centers, in ascending order
+    """
+    n = len(x)
+    # Centering keeps the prefix sums of squares small and the costs precise
+    centered = x - x[n // 2]
+    s1 = np.concatenate([[0.0], np.cumsum(centered)])
+    s2 = np.concatenate([[0.0], np.cumsum(centered * centered)])
+
+    def cost(j, i):
+        # Sum of squared distances to the mean of x[j..i]
+        total = s1[i + 1] - s1[j]
+        return s2[i + 1] - s2[j] - total * total / (i - j + 1)
+
+    previous = cost(np.zeros(n, dtype=np.int64), np.arange(n))
+    backtrack = np.zeros((k, n), dtype=np.int64)
+
+    for m in range(1, k):
+        current = np.full(n, np.inf)
+        # Segments of (first i, last i, first candidate j, last candidate j) still to solve
+        i_lo, i_hi = np.array([m]), np.array([n - 1])
+        j_lo, j_hi = np.array([m]), np.array([n - 1])
+
+        while len(i_lo):
+            mid = (i_lo + i_hi) // 2
+            lo = j_lo
+            hi = np.minimum(j_hi, mid)
+            lengths = hi - lo + 1
+
+            starts = np.cumsum(lengths) - lengths
+            j = np.arange(lengths.sum()) + np.repeat(lo - starts, lengths)
+            values = previous[j - 1] + cost(j, np.repeat(mid, lengths))
+
+            # First (smallest j) minimum of every segment
+            minimum = np.minimum.reduceat(values, starts)
+            candidates = np.flatnonzero(values == np.repeat(minimum, lengths))
+            first = candidates[np.searchsorted(candidates, starts)]
+            best = j[first]
+            current[mid] = minimum
+            backtrack[m, mid] = best
+
+            left = i_lo <= mid - 1
+            right = mid + 1 <= i_hi
+            i_lo, i_hi, j_lo, j_hi = (
+                np.concatenate([i_lo[left], mid[right] + 1]),
+                np.concatenate([mid[left] - 1, i_hi[right]]),
+                np.concatenate([j_lo[left], best[right]]),
+                np.concatenate([best[left], j_hi[right]]),
+            )
+
+        previous = current
+
+    centers = np.empty(k)
+    i = n - 1
+    for m in range(k - 1, -1, -1):
+        j = backtrack[m, i] if m > 0 else 0
+        centers[m] = x[j : i + 1].mean()
+        i = j - 1
+    return centers
+
+
+def ckmeans(values, k):
+    """
+    Cluster values in k groups with the optimal 1-D k-means.
+    The result is deterministic and has the lowest within-cluster sum of squares of any k-clustering.
+
+    Args:
+        values (np.ndarray): values to cluster
+        k (int): maximum number of clusters
+
+    Returns:
+        tuple: (labels, centers) with labels in [0, number of clusters), ordered by ascending center
+    """
+    x = np.sort(np.asarray(values, dtype=np.float64))
+    k = min(k, len(np.unique(x)))
+    centers = _ckmeans_centers(x, k)
+    return assign(values, boundaries(centers)), centers
+
+
+def quantiles(values, k):
+    """
+    Cluster values in k groups of (about) the same number of values.
+
+    Args:
+        values (np.ndarray): values to cluster
+        k (int): maximum number of clusters
+
+    Returns:
+        tuple: (labels, centers) with labels in [0, k), ordered by ascending center
+    """
+    values = np.asarray(values, dtype=np.float64)
+    edges = np.unique(np.quantile(values, np.arange(1, k) / k))
+    labels = np.searchsorted(edges, values, side="right")
+    centers = np.array([values[labels == level].mean() for level in np.unique(labels)])
+    return np.unique(labels, return_inverse=True)[1], centers
+
+
+def _sklearn(model, values, k):
+    # Fit predict on our scores
+    labels = model.fit_predict(np.asarray(values, dtype=np.float64).reshape(-1, 1))
+
+    ord_idx = np.argsort(model.cluster_centers_.flatten())
+    ranks = np.empty(k, dtype=np.int64)
+    ranks[ord_idx] = np.arange(k)
+    return ranks[labels], model.cluster_centers_.flatten()[ord_idx]
+
+
+def kmeans(values, k):
+    """
+    Cluster values in k groups with scikit-learn's KMeans, the historic engagement levels clustering.
+
+    Args:
+        values (np.ndarray): values to cluster
+        k (int): number of clusters
+
+    Returns:
+        tuple: (labels, centers) with labels in [0, k), ordered by ascending center
+    """
+    from sklearn.cluster import KMeans
+
+    return _sklearn(KMeans(n_clusters=k, random_state=0), values, k)
+
+
+def minibatch_kmeans(values, k):
+    """
+    Cluster values in k groups with scikit-learn's MiniBatchKMeans, which fits on small random batches of values.
+    The rare highest values are seldom in a batch, so on heavy tailed scores the levels are much coarser than
+    with a fit on a stratified sample.
+
+    Args:
+        values (np.ndarray): values to cluster
+        k (int): number of clusters
+
+    Returns:
+        tuple: (labels, centers) with labels in [0, k), ordered by ascending center
+    """
+    from sklearn.cluster import MiniBatchKMeans
+
+    return _sklearn(MiniBatchKMeans(n_clusters=k, random_state=0, batch_size=4096, n_init=3), values, k)
+
+
+def boundaries(centers):
+    """
+    Boundaries between clusters: the midpoints of consecutive sorted centers.
+
+    Args:
+        centers (np.ndarray): cluster centers, in ascending order
+    """
+    centers = np.asarray(centers, dtype=np.float64)
+    return (centers[1:] + centers[:-1]) / 2
+
+
+def assign(values, bounds):
+    """
+    Assign every value to its nearest cluster, given the boundaries between clusters.
+
+    Args:
+        values (np.ndarray): values to assign
+        bounds (np.ndarray): boundaries between clusters, in ascending order
+
+    Returns:
+        np.ndarray: labels in [0, len(bounds)]
+    """
+    return np.searchsorted(bounds, np.asarray(values, dtype=np.float64), side="left")
+
+
+def stratified_sample(values, sample_size):
+    """
+    Sample values evenly across their ranks: the sorted values at sample_size evenly spaced positions.
+    Unlike a random sample, every part of the distribution is represented, including the minimum and the maximum.
+
+    Args:
+        values (np.ndarray): values to sample
+        sample_size (int): number of values to keep
+
+    Returns:
+        np.ndarray: the sampled values, sorted
+    """
+    x = np.sort(np.asarray(values, dtype=np.float64))
+    return x[np.linspace(0, len(x) - 1, sample_size).round().astype(np.int64)]
+
+
+def level_boundaries(values, labels):
+    """
+    Boundaries between consecutive levels of a clustering: the midpoint between the highest value of a level
+    and the lowest value of the next one. Assigning the clustered values against them gives back their labels.
+
+    Args:
+        values (np.ndarray): clustered values
+        labels (np.ndarray): levels of the values, ordered by ascending value
+
+    Returns:
+        np.ndarray: the boundaries, in ascending order
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n_levels = labels.max() + 1
+    highest = np.full(n_levels, -np.inf)
+    lowest = np.full(n_levels, np.inf)
+    np.maximum.at(highest, labels, values)
+    np.minimum.at(lowest, labels, values)
+    return (highest[:-1] + lowest[1:]) / 2
+
+
+METHODS = {
+    "ckmeans": ckmeans,
+    "quantile": quantiles,
+    "kmeans": kmeans,
+    "minibatch_kmeans": minibatch_kmeans,
+}
+
+
+def fit(values, k, method="kmeans", sample_size=None):
+    """
+    Fit at most k levels on the values, or on a stratified sample of sample_size values when there are more.
+
+    Args:
+        values (np.ndarray): values to cluster
+        k (int): maximum number of clusters
+        method (str, optional): clustering method, see cluster. Defaults to "kmeans".
+        sample_size (int, optional): maximum number of values the levels are fitted on. Defaults to None (all).
+
+    Returns:
+        tuple: (centers, boundaries) of the levels, in ascending order
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown clustering method: {method}")
+    values = np.asarray(values, dtype=np.float64)
+    if sample_size and len(values) > sample_size:
+        values = stratified_sample(values, sample_size)
+    labels, centers = METHODS[method](values, k)
+    return centers, level_boundaries(values, labels)
+
+
+def cluster(values, k, method="kmeans", sample_size=None):
+    """
+    Cluster one-dimensional values in at most k groups.
+    When there are more than sample_size values, the levels are fitted on a stratified sample and all the values
+    are then assigned to a level with a single binary search against the level boundaries.
+
+    Args:
+        values (np.ndarray): values to cluster
+        k (int): maximum number of clusters
+        method (str, optional): one of "ckmeans" (optimal 1-D k-means), "quantile" (groups of equal size),
+                                "kmeans" (scikit-learn KMeans) or "minibatch_kmeans" (scikit-learn MiniBatchKMeans).
+                                Defaults to "kmeans".
+        sample_size (int, optional): maximum number of values the levels are fitted on. Defaults to None (all).
+
+    Returns:
+        tuple: (labels, centers) with labels ordered by ascending center
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown clustering method: {method}")
+    if sample_size and len(values) > sample_size:
+        centers, bounds = fit(values, k, method=method, sample_size=sample_size)
+        return assign(values, bounds), centers
+    return METHODS[method](values, k)
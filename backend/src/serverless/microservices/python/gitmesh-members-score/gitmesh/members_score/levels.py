@@ -0,0 +1,139 @@
+import json
+import os
+import tempfile
+from datetime import datetime
+
+import numpy as np
+
+from gitmesh.backend.infrastructure.config import MEMBERS_SCORE_STATE_DIR
+from gitmesh.members_score import binning
+
+# Smallest proportion of a level in the drift metric, so that empty levels don't make it infinite
+MIN_PROPORTION = 1e-4
+
+
+class EngagementLevels:
+    """
+    Persisted engagement levels of a tenant: the boundaries between levels in raw score space,
+    and the proportion of active members that fell in every level when they were fitted.
+
+    The levels barely move between consecutive runs, so they can be reused to level members straight away
+    and only need to be refitted once the distribution of raw scores drifted away from the fitted one.
+    """
+
+    def __init__(self, tenant_id, state_dir=MEMBERS_SCORE_STATE_DIR):
+        """
+        Initialise the (not yet fitted) engagement levels of a tenant.
+
+        Args:
+            tenant_id (str): the tenant ID
+            state_dir (str, optional): directory where the levels are persisted. Defaults to MEMBERS_SCORE_STATE_DIR.
+        """
+        self.tenant_id = str(tenant_id)
+        self.path = os.path.join(state_dir, self.tenant_id, "engagement_levels.json")
+
+        self.k = None
+        self.method = None
+        self.centers = np.zeros(0)
+        self.bounds = np.zeros(0)
+        self.proportions = np.zeros(0)
+        self.fitted_at = None
+
+    def load(self):
+        """
+        Load the persisted levels of the tenant, if any.
+
+        Returns:
+            bool: whether levels were found
+        """
+        if not os.path.exists(self.path):
+            return False
+
+        with open(self.path) as f:
+            data = json.load(f)
+
+        self.k = data["k"]
+        self.method = data["method"]
+        self.centers = np.array(data["centers"], dtype=np.float64)
+        self.bounds = np.array(data["bounds"], dtype=np.float64)
+        self.proportions = np.array(data["proportions"], dtype=np.float64)
+        self.fitted_at = datetime.fromisoformat(data["fitted_at"])
+        return True
+
+    def save(self):
+        """
+        Persist the levels, replacing the file atomically.
+        """
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        data = {
+            "k": self.k,
+            "method": self.method,
+            "centers": self.centers.tolist(),
+            "bounds": self.bounds.tolist(),
+            "proportions": self.proportions.tolist(),
+            "fitted_at": self.fitted_at.isoformat(),
+        }
+
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def fits(self, k, method):
+        """
+        Whether levels were fitted with the given number of clusters and clustering method.
+
+        Args:
+            k (int): maximum number of clusters
+            method (str): clustering method
+        """
+        return self.fitted_at is not None and self.k == k and self.method == method
+
+    def fit(self, values, k, method="kmeans", sample_size=None):
+        """
+        Fit the levels on the raw scores of the active members.
+
+        Args:
+            values (np.ndarray): raw scores of the active members
+            k (int): maximum number of clusters
+            method (str, optional): clustering method, see binning.cluster. Defaults to "kmeans".
+            sample_size (int, optional): maximum number of values the levels are fitted on. Defaults to None (all).
+        """
+        self.k = k
+        self.method = method
+        self.centers, self.bounds = binning.fit(values, k, method=method, sample_size=sample_size)
+        self.proportions = self._proportions(values)
+        self.fitted_at = datetime.now()
+
+    def assign(self, values):
+        """
+        Levels of raw scores, in [0, number of levels).
+
+        Args:
+            values (np.ndarray): raw scores
+        """
+        return binning.assign(values, self.bounds)
+
+    def drift(self, values):
+        """
+        Population stability index between the proportions of members per level when the levels were fitted
+        and the proportions of the given raw scores. Below 0.1 the distribution is usually considered stable,
+        above 0.25 it has shifted significantly.
+
+        Args:
+            values (np.ndarray): raw scores of the active members
+
+        Returns:
+            float: the population stability index
+        """
+        expected = np.maximum(self.proportions, MIN_PROPORTION)
+        actual = np.maximum(self._proportions(values), MIN_PROPORTION)
+        return float(((actual - expected) * np.log(actual / expected)).sum())
+
+    def _proportions(self, values):
+        labels = self.assign(values)
+        return np.bincount(labels, minlength=len(self.bounds) + 1) / max(len(labels), 1)
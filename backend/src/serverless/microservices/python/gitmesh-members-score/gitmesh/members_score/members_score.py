@@ -1,79 +1,377 @@
-import decimal
 from gitmesh.backend.infrastructure.logging import get_logger
 from gitmesh.backend.repository import Repository
 from gitmesh.backend.repository.keys import DBKeys as dbk
-from datetime import datetime
+from datetime import datetime, timedelta
 from dateutil import parser
 from gitmesh.backend.controllers import MembersController
 from gitmesh.backend.models import Member, Tenant
 import time
-from gitmesh.backend.utils.datetime import GitmeshDateTime as gdt
-from sklearn.cluster import KMeans
 import numpy as np
+from sqlalchemy import text
+from gitmesh.backend.infrastructure.config import (
+    MEMBERS_SCORE_ROLLUP_OVERLAP_MINUTES,
+    MEMBERS_SCORE_ROLLUP_REBUILD_DAYS,
+    MEMBERS_SCORE_LEVELS_MAX_DRIFT,
+    MEMBERS_SCORE_STATE_DIR,
+)
+from gitmesh.members_score.aggregation import (
+    WINDOW_DAYS,
+    decay_weights,
+    monthly_stats_from_totals,
+    ordinals_to_datetime64,
+    window_days,
+)
+from gitmesh.members_score.levels import EngagementLevels
+from gitmesh.members_score.rollup import ActivityRollup
+from gitmesh.members_score.binning import cluster
 
 logger = get_logger(__name__)
 
+# Number of score updates sent in a single db operations message. An update is about 60 bytes, so messages filled up to
+# SQS_MAX_PAYLOAD_BYTES would carry thousands of them. The nodejs worker updates the members of a message one after
+# the other, and a message it has not finished within the 30s visibility timeout of its queue is delivered again,
+# so messages are capped by number of updates instead. They are still sent 10 at a time with SendMessageBatch.
+UPDATES_CHUNK_SIZE = 100
+
+# Number of members read per page when comparing the new scores with the stored ones
+MEMBERS_PAGE_SIZE = 1000
+
+# Activities index used by the scoring query, see check_scoring_index
+SCORING_INDEX = "ix_activities_tenantId_timestamp"
+
+# Daily activity of the members over the days of the scoring window, only the days with activity are returned.
+# Members without activity in the window are not fetched, main resets their stored score.
+SCORES_QUERY = """
+    select "memberId", date("timestamp") as day, count(*) as activities, sum(score) as score
+    from public.activities
+    where "tenantId" = CAST(:tenant_id as uuid)
+    and "timestamp" >= :since
+    and "deletedAt" is null
+    group by "memberId", date("timestamp")
+"""
+
+# Daily activity of the (member, day) cells of the scoring window that have activities created since :created_since,
+# aggregated over all their activities so that they can replace the cells of the activity rollup.
+# The delta is found with the ix_activities_tenantId_createdAt index, see the
+# V1768770000__activities-tenant-created-at-index migration
+ROLLUP_DELTA_QUERY = """
+    with touched as (
+        select distinct "memberId", date("timestamp") as day
+        from public.activities
+        where "tenantId" = CAST(:tenant_id as uuid)
+        and "createdAt" > :created_since
+        and "timestamp" >= :since
+        and "deletedAt" is null
+    )
+    select activities."memberId", date(activities."timestamp"), count(*), sum(activities.score),
+        max(activities."createdAt")
+    from public.activities
+    join touched on touched."memberId" = activities."memberId" and touched.day = date(activities."timestamp")
+    where activities."tenantId" = CAST(:tenant_id as uuid)
+    and activities."timestamp" >= :since
+    and activities."deletedAt" is null
+    group by activities."memberId", date(activities."timestamp")
+"""
+
+# Daily activity of the scoring window with the latest createdAt of every day, to build an activity rollup
+ROLLUP_QUERY = """
+    select "memberId", date("timestamp"), count(*), sum(score), max("createdAt")
+    from public.activities
+    where "tenantId" = CAST(:tenant_id as uuid)
+    and "timestamp" >= :since
+    and "deletedAt" is null
+    group by "memberId", date("timestamp")
+"""
+
+# Monthly engagement of the members over the months of the scoring window,
+# from the memberMonthlyEngagement materialized view.
+ENGAGEMENT_VIEW_QUERY = """
+    select "memberId", month, activities, "activitiesSquares", score, "scoreSquares"
+    from "memberMonthlyEngagement"
+    where "tenantId" = CAST(:tenant_id as uuid)
+    and month >= :first_month
+"""
+
+
+def _parse_timestamp(value):
+    """
+    Parse the timestamp of an action into a naive datetime, dropping its timezone.
+    ISO-8601 strings and epoch seconds are parsed directly, anything else falls back to dateutil.
+
+    Args:
+        value (str or int or float or datetime): the timestamp
+    """
+    if isinstance(value, datetime):
+        return value.replace(tzinfo=None)
+    if isinstance(value, (int, float)):
+        return datetime.utcfromtimestamp(value)
+    try:
+        if value.endswith("Z"):
+            value = value[:-1] + "+00:00"
+        return datetime.fromisoformat(value).replace(tzinfo=None)
+    except ValueError:
+        return parser.parse(value).replace(tzinfo=None)
+
 
 class MembersScore:
-    def __init__(self, tenant_id, repository=False, test=False, send=True):
+    def __init__(
+        self,
+        tenant_id,
+        repository=False,
+        test=False,
+        send=True,
+        source="activities",
+        binning="kmeans",
+        sample_size=None,
+        levels=False,
+        state_dir=MEMBERS_SCORE_STATE_DIR,
+    ):
+        """
+        Initialise the members score calculation for a tenant.
+
+        Args:
+            tenant_id (str): the tenant ID
+            repository (Repository, optional): the repository to use for transactions. Defaults to False.
+            test (bool, optional): whether we are in test mode. Defaults to False.
+            send (bool, optional): whether to send the score updates. Defaults to True.
+            source (str, optional): where the monthly engagement is computed from. "activities" scans the raw
+                                    activities of the last year, "rollup" incrementally maintains a persisted daily
+                                    rollup of the tenant, "engagement_view" reads the memberMonthlyEngagement
+                                    materialized view. None fetches nothing up front, to score a subset of
+                                    members with score_members. Defaults to "activities".
+            binning (str, optional): how raw scores are clustered in engagement levels, one of "ckmeans",
+                                     "quantile", "kmeans" or "minibatch_kmeans". See binning.cluster.
+                                     Defaults to "kmeans".
+            sample_size (int, optional): on tenants with more active members, the engagement levels are fitted
+                                         on a stratified sample of this size. Defaults to None (no sampling).
+            levels (bool, optional): whether to persist the engagement levels of the tenant and reuse them until
+                                     the raw scores drift away from them. Defaults to False.
+            state_dir (str, optional): directory where the activity rollup and the engagement levels of the tenant
+                                       are persisted. Defaults to MEMBERS_SCORE_STATE_DIR.
+        """
 
         self.tenant_id = tenant_id
+        self.state_dir = state_dir
+        # Every score of the run is computed relative to the same point in time
+        self.now = datetime.now()
 
         if not repository:
             self.repository = Repository(tenant_id=self.tenant_id, test=test)
         else:
             self.repository = repository
 
-        self.fetch_scores()
-        self.team_members = [
-            member.id for member in self.repository.find_all(Member, query={"attributes.isTeamMember.default": True})
-        ]
+        # Members being scored, and their monthly engagement matrices (see aggregation.monthly_stats)
+        # with a row per member in the same order
+        self.member_ids = []
+        self.stats = None
+
+        if source == "rollup":
+            self.fetch_scores_from_rollup()
+        elif source == "activities":
+            self.fetch_scores()
+        elif source == "engagement_view":
+            self.fetch_scores_from_view()
+        elif source is not None:
+            raise ValueError(f"Unknown members score source: {source}")
+
+        # Filled in with the members being scored by score_members
+        self.team_members = set()
 
         self.send = send
+        self.binning = binning
+        self.sample_size = sample_size
+
+        self.levels = None
+        if levels:
+            self.levels = EngagementLevels(self.tenant_id, self.state_dir)
+            self.levels.load()
 
         self.original_scores = {}
-        self.scores = {}
+
+    def _window_start(self):
+        """
+        Start of the first day of the scoring window of the run.
+        """
+        return datetime.combine(self.now.date(), datetime.min.time()) - timedelta(days=WINDOW_DAYS - 1)
 
     def fetch_scores(self):
         """
         This function accesses the database and fetches the mean scores for each member for the last year
 
-        The sql query selects all members for a tenant,
-        and joins it with a table containing every single day for the past year.
-        This resulting table is then used to calculate the monthly mean score of
-        engagement for each member for the past year.
-        The results of this query should be a table where each row contains a member and his/her engagement
+        Only the daily activity aggregates of the scoring window are fetched, and the monthly mean and standard
+        deviation of every member are computed from them in NumPy. Days without activity count as zero,
+        as if every member had been joined with every day of the window.
+        The results are (members x months) matrices with the engagement of every member
         for each month of the past year.
+        Only members with activity in the window are fetched, the timestamp bound keeps the query on the
+        (tenantId, timestamp) index, which is checked once per run by check_scoring_index.
+        """
+        self.check_scoring_index()
+        with self.repository.engine.connect() as con:
+            rows = con.execute(text(SCORES_QUERY), self._scores_params()).fetchall()
+
+        # An in-memory rollup turns the daily aggregates into monthly engagement
+        rollup = ActivityRollup(self.tenant_id)
+        rollup.fold([(member_id, day, count, score, None) for member_id, day, count, score in rows])
+        self.member_ids, self.stats = rollup.monthly_stats(self.now.date())
+
+    def _scores_params(self):
+        return {
+            "tenant_id": str(self.repository.tenant_id),
+            "since": self._window_start(),
+        }
+
+    def check_scoring_index(self):
+        """
+        Check that the activities index the scoring query relies on exists, and whether the query plan uses it.
+        It is created by the V1768750000__activities-tenant-timestamp-index migration.
+
+        Returns:
+            bool: whether the index exists and is used by the scoring query of the tenant
         """
         with self.repository.engine.connect() as con:
+            exists = (
+                con.execute(
+                    text("select 1 from pg_indexes where tablename = 'activities' and indexname = :index"),
+                    {"index": SCORING_INDEX},
+                ).first()
+                is not None
+            )
+            if not exists:
+                logger.warning(f"Index {SCORING_INDEX} is missing, scoring scans all the activities of the tenant")
+                return False
+
+            plan = "\n".join(row[0] for row in con.execute(text(f"explain {SCORES_QUERY}"), self._scores_params()))
+
+        used = SCORING_INDEX in plan
+        if not used:
+            logger.warning(f"Scoring query of tenant {self.tenant_id} does not use index {SCORING_INDEX}:\n{plan}")
+        return used
+
+    def fetch_scores_from_view(self):
+        """
+        Fetch the mean scores for each member for the last year from the memberMonthlyEngagement materialized view,
+        which is refreshed concurrently every two hours by the refreshMaterializedViews job.
 
-            id = self.repository.tenant_id
-
-            self.mean_scores = con.execute(
-                f'select "memberId", avg(number_daily_activities) as average_daily_activities, avg(summed_daily_score) as summed_daily_score, coalesce(stddev(number_daily_activities),0), coalesce(stddev(summed_daily_score),0)  ,extract(month from MyJoinDate) as month, extract(year from MyJoinDate) as year\
-                from (\
-                select FullDates."memberId", FullDates.MyJoinDate, coalesce(sum(e), 0) as number_daily_activities, coalesce(sum(s), 0) as summed_daily_score from \
-                (\
-                select "memberId", AllDays.MyJoinDate, coalesce(sum(e), 0) as number_daily_activities, coalesce(sum(s), 0) as summed_daily_score\
-                from\
-                (SELECT date_trunc(\'day\', dd):: date as MyJoinDate\
-                FROM generate_series\
-                    ( (now() - INTERVAL \'364 DAY\')::timestamp\
-                    , (now())::timestamp\
-                    , \'1 day\'::interval) dd\
-                    ) AllDays\
-                cross join ( select "memberId", count(*) as e, sum(score) as s, date("timestamp") as "timestamp"  \
-                from public.activities where "activities"."tenantId" = CAST(\'{id}\' as uuid) \
-                group by "memberId", date("timestamp") ) U\
-                group by "memberId", Alldays.MyJoinDate order by Alldays.MyJoinDate ASC\
-                ) FullDates \
-                left join (select "memberId" as cm_id, count(*) as e, sum(score) as s, date("timestamp") as "timestamp"  \
-                from public.activities where "activities"."tenantId" = CAST(\'{id}\' as uuid) \
-                group by "memberId", date("timestamp")) T on T."cm_id"=FullDates."memberId" and T."timestamp" = FullDates.MyJoinDate\
-                group by FullDates."memberId", FullDates.MyJoinDate order by FullDates.MyJoinDate asc\
-                ) Daily group by "memberId", extract(month from MyJoinDate), extract(year from MyJoinDate)'
+        The view stores monthly totals, so the window is calendar aligned: the first month of the window
+        is taken as a whole instead of from the first day of the window. Activities from after the last
+        refresh of the view are only taken into account by the next run.
+        """
+        today = self.now.date()
+        first_month = ordinals_to_datetime64(window_days(today)[0]).astype("datetime64[M]").astype("datetime64[D]")
+
+        with self.repository.engine.connect() as con:
+            rows = con.execute(
+                text(ENGAGEMENT_VIEW_QUERY),
+                {"tenant_id": str(self.repository.tenant_id), "first_month": first_month.item()},
             ).fetchall()
 
+        index = {}
+        for row in rows:
+            index.setdefault(row[0], len(index))
+
+        def _column(i, dtype=np.float64):
+            return np.fromiter((row[i] or 0 for row in rows), dtype=dtype, count=len(rows))
+
+        self.member_ids = list(index)
+        self.stats = monthly_stats_from_totals(
+            np.fromiter((index[row[0]] for row in rows), dtype=np.int64, count=len(rows)),
+            np.array([row[1] for row in rows], dtype="datetime64[D]"),
+            _column(2),
+            _column(3),
+            _column(4),
+            _column(5),
+            len(index),
+            today,
+        )
+
+    def fetch_scores_from_rollup(self):
+        """
+        Fetch the mean scores for each member for the last year from the persisted daily activity rollup.
+
+        Only the days with activities created since the previous run are re-aggregated and replaced in the rollup,
+        so the cost of a run scales with the activity delta instead of the history of the tenant.
+        The rollup is rebuilt from scratch when it is missing or older than MEMBERS_SCORE_ROLLUP_REBUILD_DAYS,
+        which picks up activities that were deleted, merged into another member or committed late.
+        """
+        self.member_ids, self.stats = self._updated_rollup(self.now).monthly_stats(self.now.date())
+
+    def _updated_rollup(self, now, rebuild=True):
+        """
+        Load the persisted activity rollup of the tenant and update the days with activities created since
+        its watermark. The watermark is moved back by MEMBERS_SCORE_ROLLUP_OVERLAP_MINUTES, so that activities
+        committed late or with a skewed createdAt are still picked up. The days they fall in are aggregated again
+        as a whole and replace the ones of the rollup, so days that were already folded are not counted twice.
+
+        Args:
+            now (datetime.datetime): the current time
+            rebuild (bool, optional): whether to rebuild a missing or stale rollup from scratch. Defaults to True.
+
+        Returns:
+            ActivityRollup: the updated rollup, or None when there is none and rebuild is False
+        """
+        rollup = ActivityRollup(self.tenant_id, self.state_dir)
+        found = rollup.load()
+
+        if not rebuild and not found:
+            return None
+        if rebuild and (not found or rollup.is_stale(now, MEMBERS_SCORE_ROLLUP_REBUILD_DAYS)):
+            rollup = ActivityRollup(self.tenant_id, self.state_dir)
+            rollup.built_at = now
+
+        params = self._scores_params()
+        if rollup.watermark is not None:
+            query = ROLLUP_DELTA_QUERY
+            params["created_since"] = rollup.watermark - timedelta(minutes=MEMBERS_SCORE_ROLLUP_OVERLAP_MINUTES)
+        else:
+            query = ROLLUP_QUERY
+
+        with self.repository.engine.connect() as con:
+            delta = con.execute(text(query), params).fetchall()
+
+        logger.info(f"Updating {len(delta)} daily aggregates of the activity rollup of tenant {self.tenant_id}")
+        rollup.replace(delta)
+        rollup.prune(now.date())
+        rollup.save()
+        return rollup
+
+    def fetch_member_scores(self, member_ids):
+        """
+        Fetch the mean scores for each month of the last year of some members only.
+
+        Args:
+            member_ids ([str]): IDs of the members
+        """
+        query = """select "memberId", date("timestamp"), count(*), sum(score), max("createdAt")
+                   from public.activities
+                   where "activities"."tenantId" = CAST(:tenant_id as uuid)
+                   and "activities"."memberId" = any(CAST(:member_ids as uuid[]))
+                   and "activities"."timestamp" >= :since
+                   and "activities"."deletedAt" is null
+                   group by "memberId", date("timestamp")"""
+        params = {
+            "tenant_id": str(self.repository.tenant_id),
+            "member_ids": [str(member_id) for member_id in member_ids],
+            "since": self._window_start(),
+        }
+
+        with self.repository.engine.connect() as con:
+            daily = con.execute(text(query), params).fetchall()
+
+        # An in-memory rollup turns the daily aggregates into monthly engagement
+        rollup = ActivityRollup(self.tenant_id)
+        rollup.fold(daily)
+        self.member_ids, self.stats = rollup.monthly_stats(self.now.date())
+
+    def _calculate_days(self, date):
+        """
+        Calculate the number of whole days elapsed since a date, at the time of the run
+
+        Args:
+            date (datime.datetime): naive UTC date to calculate days from
+        """
+        return (self.now - date).days
+
     def _calculate_months(self, date):
         """
         Calculate time difference
@@ -81,10 +379,7 @@ class MembersScore:
         Args:
             date (datime.datetime): the date to calculate months from
         """
-        now = gdt.format(datetime.now())
-        date = gdt.format(date)
-        diff = now - date
-        return (diff.days) / 30
+        return self._calculate_days(date) / 30
 
     def calculate_member_score(self, i, row):
 
@@ -95,21 +390,21 @@ class MembersScore:
 
         average_monthly_score = row[2]
 
-        current_month = datetime.now().month
-        current_day = datetime.now().day
+        current_month = self.now.month
+        current_day = self.now.day
 
         stddev_score_activities = row[4]
         month = int(row[5])
         year = int(row[6])
 
         if month == current_month:
-            average_monthly_score = average_monthly_score * decimal.Decimal(current_day / 30)
+            average_monthly_score = float(average_monthly_score) * current_day / 30
 
         sm = float(average_monthly_score) / float(1 + stddev_score_activities)
 
-        time_from_month = self._calculate_months(datetime.strptime(f"{int(year)}-{int(month)}", "%Y-%m"))
+        days_from_month = self._calculate_days(datetime(year, month, 1))
 
-        result = ((0.9**time_from_month) * sm) * (k / m)
+        result = (decay_weights(days_from_month) * sm) * (k / m)
 
         return result
 
@@ -118,10 +413,14 @@ class MembersScore:
         for member in lookalikes:
             score = 0
             if dbk.ACTIONS in member.gitmeshInfo.get("github", {}):
-                for action in member.gitmeshInfo["github"][dbk.ACTIONS]:
-                    timestamp = timestamp = parser.parse(action["timestamp"])
-                    timestamp = timestamp.replace(tzinfo=None)
-                    score += (0.9 ** self._calculate_months(timestamp)) * action["score"]
+                actions = member.gitmeshInfo["github"][dbk.ACTIONS]
+                days = np.fromiter(
+                    (self._calculate_days(_parse_timestamp(action["timestamp"])) for action in actions),
+                    dtype=np.int64,
+                    count=len(actions),
+                )
+                scores = np.fromiter((action["score"] for action in actions), dtype=np.float64, count=len(actions))
+                score = float(decay_weights(days) @ scores)
 
             twitter = "twitter" in member.username
             email = member.email
@@ -132,104 +431,265 @@ class MembersScore:
             out[member.id] = round(score, 2)
         return out
 
-    def _member_scores_(self, members):
+    def _score_arrays(self, stats, now):
         """
-        Calculate the raw score for all members based on the activities they performed.
-        Loop through the list of all activities and add the score of the activity weighted by the time since the activity
-        to the score of the member.
+        Compute the decay-weighted score of every (member, month) cell of the monthly engagement matrices.
+        It is the columnar equivalent of calling calculate_member_score on every (member, month) row.
+
+        Args:
+            stats (tuple): monthly engagement of the members, as returned by aggregation.monthly_stats
+            now (datetime.datetime): reference time used for every month
+
+        Returns:
+            np.ndarray: (members x months) matrix of scores
         """
+        k = 10
+        m = 13  # Number of months to take into account
 
-        mean_scores = self.mean_scores
+        years, months, _, average_monthly_score, _, stddev_score_activities = stats
 
-        scores = {}
-        for i, row in enumerate(mean_scores):
+        # The month of the run only counts for the days elapsed so far
+        scale = np.where(months == now.month, now.day / 30, 1.0)
+        sm = average_monthly_score * scale / (1 + stddev_score_activities)
 
-            member_id = row[0]
+        month_start = ((years - 1970) * 12 + months - 1).astype("datetime64[M]").astype("datetime64[D]")
+        days_from_month = (np.datetime64(now.date(), "D") - month_start).astype(np.int64)
 
-            # Checking that member is not team member
-            # if "team" not in member.gitmeshInfo:
-            if member_id not in self.team_members:
-                if member_id not in scores:
-                    scores[member_id] = 0
+        return sm * (decay_weights(days_from_month) * (k / m))
 
-                scores[member_id] += self.calculate_member_score(i, row)
-            else:
-                scores[member_id] = -1
+    def _member_scores_(self):
+        """
+        Calculate the raw score for all members based on the activities they performed.
+        The monthly scores weighted by the time since the month are summed per member.
+        Team members get a raw score of -1.
+        """
+        if len(self.member_ids) == 0:
+            return {}
 
-        return scores
+        index, totals = self._raw_score_arrays()
+
+        # Checking that member is not team member
+        is_team_member = np.fromiter(
+            (member_id in self.team_members for member_id in index), dtype=bool, count=len(index)
+        )
+        totals[is_team_member] = -1
+
+        return dict(zip(index, totals.tolist()))
+
+    def _raw_score_arrays(self):
+        """
+        Sum the monthly scores weighted by the time since the month per member.
+
+        Returns:
+            tuple: (index, totals) with the position of every member id in totals, and the raw score of every member
+        """
+        if len(self.member_ids) == 0:
+            return {}, np.zeros(0)
+        index = {member_id: i for i, member_id in enumerate(self.member_ids)}
+        return index, self._score_arrays(self.stats, self.now).sum(axis=1)
 
     def normalise(self, scores):
         """
         Normalise the scores of all members based on the median raw score of all members.
         """
+        levels = self._normalise_array(np.fromiter(scores.values(), dtype=np.float64, count=len(scores)))
+        if levels is None:
+            return {}
+        return dict(zip(scores, levels.tolist()))
 
-        # Getting a list of members who have 0 engagement
-        # And a list of raw scores for noramlization
-        inactive_members = [k for k, v in scores.items() if v == 0]
+    def _normalise_array(self, raw_scores):
+        """
+        Cluster the raw scores of the members in engagement levels, from 1 to at most 10.
+        Members with no engagement get a level of 0.
 
-        active_members_scores = {k: v for k, v in scores.items() if v != 0}
+        Args:
+            raw_scores (np.ndarray): raw score of every member
 
-        active_members_raw_scores = [active_members_scores[x] for x in active_members_scores.keys()]
+        Returns:
+            np.ndarray: the level of every member, or None when no member has engagement
+        """
+        active = raw_scores != 0
+        active_members_raw_scores = raw_scores[active]
 
-        if len(active_members_scores) == 0:
-            return active_members_scores
+        if len(active_members_raw_scores) == 0:
+            return None
 
-        # Initialize the k means cluster
-        if len(active_members_raw_scores) < 10:
-            k = len(active_members_raw_scores)
+        # Cluster the scores in at most 10 engagement levels
+        k = min(len(active_members_raw_scores), 10)
+        if self.levels is not None:
+            normalized_scores = self._persisted_levels(active_members_raw_scores, k)
         else:
-            k = 10
-        kmeans = KMeans(n_clusters=k, random_state=0)
-        # Fit predict on our scores
-        normalized_scores = kmeans.fit_predict(np.array(active_members_raw_scores).reshape(-1, 1))
+            normalized_scores, _ = cluster(
+                active_members_raw_scores, k, method=self.binning, sample_size=self.sample_size
+            )
 
-        ord_idx = np.argsort(kmeans.cluster_centers_.flatten())
+        # Inactive members get level 0, the others their cluster
+        levels = np.zeros(len(raw_scores), dtype=np.int64)
+        levels[active] = np.asarray(normalized_scores) + 1
+        return levels
 
-        cntrs = np.zeros_like(normalized_scores) - 1
-        for i in np.arange(k):
-            cntrs[normalized_scores == ord_idx[i]] = i
+    def _persisted_levels(self, values, k):
+        """
+        Level raw scores with the persisted engagement levels of the tenant.
+        The levels are refitted and persisted when there are none yet, when they were fitted differently
+        or when the raw scores drifted more than MEMBERS_SCORE_LEVELS_MAX_DRIFT from them.
 
-        normalized_scores = cntrs
+        Args:
+            values (np.ndarray): raw scores of the active members
+            k (int): maximum number of clusters
 
-        # Assigning inactive member engagement level
-        for key in inactive_members:
-            scores[key] = 0
+        Returns:
+            np.ndarray: levels of the raw scores
+        """
+        if self.levels.fits(k, self.binning):
+            drift = self.levels.drift(values)
+            if drift <= MEMBERS_SCORE_LEVELS_MAX_DRIFT:
+                logger.info(f"Reusing the engagement levels of tenant {self.tenant_id} (drift {drift:.3f})")
+                return self.levels.assign(values)
+            logger.info(f"Engagement levels of tenant {self.tenant_id} drifted ({drift:.3f}), refitting them")
+
+        self.levels.fit(values, k, method=self.binning, sample_size=self.sample_size)
+        self.levels.save()
+        return self.levels.assign(values)
+
+    def _has_persisted_levels(self):
+        """
+        Whether the tenant has persisted engagement levels to score members with, logging when it has none.
+        """
+        if self.levels is None or self.levels.fitted_at is None:
+            logger.info(f"No engagement levels persisted for tenant {self.tenant_id}, skipping")
+            return False
+        return True
 
-        # Assigning other engagement level
-        i = 0
-        for key in active_members_scores:
-            scores[key] = normalized_scores[i] + 1
-            i += 1
-        return scores
+    def score_members(self, members, rollup=False):
+        """
+        Score some members of the tenant with its persisted engagement levels, without a full tenant run.
+        Nothing is scored when the tenant has no persisted levels yet, its next full run will fit them.
 
-    def main(self):
-        # Keeping track of time for lambda timeout
-        start = time.time()
-        members = self.repository.find_all(Member, query={})
+        Args:
+            members ([tuple]): rows of (id, score, isTeamMember flag) of the members to score
+            rollup (bool, optional): whether to compute their engagement from the persisted activity rollup of the
+                                     tenant, when there is one, instead of their activities. Defaults to False.
+
+        Returns:
+            dict: the engagement level of every member
+        """
+        if not self._has_persisted_levels():
+            return {}
+
+        self.original_scores = {member_id: score for member_id, score, _ in members}
+        self.team_members = {member_id for member_id, _, is_team_member in members if is_team_member is True}
 
-        for member in members:
-            self.original_scores[member.id] = member.score
+        updated_rollup = self._updated_rollup(self.now, rebuild=False) if rollup else None
+        if updated_rollup is not None:
+            self.member_ids, self.stats = updated_rollup.monthly_stats(
+                self.now.date(), member_ids=list(self.original_scores)
+            )
+        else:
+            self.fetch_member_scores(list(self.original_scores))
+        raw_scores = {member_id: 0 for member_id in self.original_scores}
+        raw_scores.update(self._member_scores_())
+
+        member_ids = [member_id for member_id, score in raw_scores.items() if score != 0]
+        levels = self.levels.assign(np.fromiter((raw_scores[member_id] for member_id in member_ids), dtype=np.float64))
+        scores = {member_id: 0 for member_id in raw_scores}
+        scores.update(zip(member_ids, (levels + 1).tolist()))
+
+        updates = [
+            {"id": str(member_id), "update": {dbk.SCORE: score}}
+            for member_id, score in scores.items()
+            if score != self.original_scores.get(member_id, -2)
+        ]
+        if updates:
+            MembersController(self.tenant_id, repository=self.repository).update(
+                updates, send=self.send, chunk_size=UPDATES_CHUNK_SIZE
+            )
+            logger.info(f"Updated {len(updates)} member scores of tenant {self.tenant_id} with its persisted levels")
+
+        return scores
+
+    def rescore(self, member_ids):
+        """
+        Rescore the given members of the tenant, for instance the ones that just had new activities,
+        against its persisted activity rollup and engagement levels.
 
-        self.scores = self._member_scores_(members)
+        Args:
+            member_ids ([str]): IDs of the members
 
-        # Take care of case where tenant doesn't have activities
-        if len(self.scores) == 0:
+        Returns:
+            dict: the engagement level of every member
+        """
+        if not self._has_persisted_levels():
             return {}
 
-        scores_to_update = self.normalise(self.scores)
+        members = self.repository.find_members_by_id(
+            member_ids, fields=["id", "score", "attributes.isTeamMember.default"]
+        )
+        return self.score_members(members, rollup=True)
 
-        changed = 0
+    def main(self, return_scores=True):
+        """
+        Score all the members of the tenant and send the scores that changed.
 
-        members_controller = MembersController(self.tenant_id, repository=self.repository)
+        The raw scores are kept in arrays indexed by the position of the member ids. The stored scores and team
+        member flags are then read by keyset pages of MEMBERS_PAGE_SIZE members into two more arrays,
+        so memory does not grow with ORM objects or per member dictionaries, and only the changed scores
+        are turned into updates. Members without activity in the scoring window are not scored, the same pass
+        resets the ones that still have a stored score to 0.
 
-        for n, member_id in enumerate(scores_to_update):
-            if time.time() - start > 800:
-                break
-            # We only update the score if it has changed
-            if scores_to_update[member_id] != self.original_scores.get(member_id, -2):
-                changed += 1
-                members_controller.update(
-                    [{"id": str(member_id), "update": {dbk.SCORE: scores_to_update[member_id]}}], send=self.send
-                )
+        Args:
+            return_scores (bool, optional): whether to return the scores of the members. Defaults to True.
 
-        return scores_to_update
+        Returns:
+            dict: the engagement level of every member that was scored or reset,
+                  or an empty dict when not returning them
+        """
+        # Keeping track of time to report the throughput of the run
+        start = time.time()
+
+        index, raw_scores = self._raw_score_arrays()
+        # Members without activity in the scoring window whose stored score must be reset
+        inactive = []
+
+        # Stored score of every member, NaN when it has none so that it is always updated
+        original_scores = np.full(len(index), np.nan)
+        # The team member flag is read in the same pass as the scores, instead of a separate query
+        for page in self.repository.paginate(
+            Member, fields=["id", "score", "attributes.isTeamMember.default"], page_size=MEMBERS_PAGE_SIZE
+        ):
+            for member_id, score, is_team_member in page:
+                i = index.get(member_id)
+                if i is None:
+                    if score is not None and score > 0:
+                        inactive.append(member_id)
+                    continue
+                if score is not None:
+                    original_scores[i] = score
+                if is_team_member is True:
+                    raw_scores[i] = -1
+
+        levels = self._normalise_array(raw_scores)
+        if levels is None:
+            levels = np.zeros(len(raw_scores), dtype=np.int64)
+
+        # We only update the score if it has changed
+        member_ids = list(index)
+        updates = [
+            {"id": str(member_ids[i]), "update": {dbk.SCORE: int(levels[i])}}
+            for i in np.flatnonzero(levels != original_scores)
+        ]
+        updates += [{"id": str(member_id), "update": {dbk.SCORE: 0}} for member_id in inactive]
+
+        if updates:
+            members_controller = MembersController(self.tenant_id, repository=self.repository)
+            messages = members_controller.update(updates, send=self.send, chunk_size=UPDATES_CHUNK_SIZE)
+
+            elapsed = time.time() - start
+            logger.info(
+                f"Updated {len(updates)} member scores of tenant {self.tenant_id} in {messages} messages "
+                f"in {elapsed:.1f}s ({len(updates) / max(elapsed, 1e-3):.0f} updates/s)"
+            )
+
+        if not return_scores:
+            return {}
+        return {**dict(zip(member_ids, levels.tolist())), **dict.fromkeys(inactive, 0)}
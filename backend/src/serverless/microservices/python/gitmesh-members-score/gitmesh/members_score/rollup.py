@@ -0,0 +1,249 @@
+import json
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from gitmesh.backend.infrastructure.config import MEMBERS_SCORE_STATE_DIR
+from gitmesh.backend.infrastructure.logging import get_logger
+from gitmesh.members_score.aggregation import WINDOW_DAYS, monthly_stats, window_days
+
+logger = get_logger(__name__)
+
+
+class ActivityRollup:
+    """
+    Persisted daily activity rollup of a tenant: (memberId, day) -> (number of activities, summed score).
+
+    The rollup keeps a watermark with the latest activity createdAt it has seen, so that consecutive scoring runs
+    only need to re-aggregate the (member, day) cells of the activities created since the previous run.
+    Every member that ever had an activity is kept, even when all its days fell out of the scoring window.
+    """
+
+    def __init__(self, tenant_id, state_dir=MEMBERS_SCORE_STATE_DIR):
+        """
+        Initialise an empty rollup for a tenant.
+
+        Args:
+            tenant_id (str): the tenant ID
+            state_dir (str, optional): directory where the rollups are persisted. Defaults to MEMBERS_SCORE_STATE_DIR.
+        """
+        self.tenant_id = str(tenant_id)
+        self.path = os.path.join(state_dir, self.tenant_id, "activity_rollup.npz")
+
+        self.member_ids = []
+        self._member_index = {}
+        self.member_idx = np.zeros(0, dtype=np.int64)
+        self.days = np.zeros(0, dtype=np.int64)
+        self.counts = np.zeros(0, dtype=np.int64)
+        self.scores = np.zeros(0, dtype=np.float64)
+
+        self.watermark = None
+        self.built_at = None
+
+    def load(self):
+        """
+        Load the persisted rollup of the tenant, if any.
+
+        Returns:
+            bool: whether a rollup was found
+        """
+        if not os.path.exists(self.path):
+            return False
+
+        with np.load(self.path) as data:
+            meta = json.loads(str(data["meta"]))
+            self.member_ids = data["member_ids"].tolist()
+            self.member_idx = data["member_idx"]
+            self.days = data["days"]
+            self.counts = data["counts"]
+            self.scores = data["scores"]
+
+        self._member_index = {member_id: i for i, member_id in enumerate(self.member_ids)}
+        self.watermark = datetime.fromisoformat(meta["watermark"]) if meta["watermark"] else None
+        self.built_at = datetime.fromisoformat(meta["built_at"])
+        return True
+
+    def save(self):
+        """
+        Persist the rollup. The file is replaced atomically so a crashed run never leaves a partial rollup behind.
+        """
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        meta = {
+            "watermark": self.watermark.isoformat() if self.watermark else None,
+            "built_at": self.built_at.isoformat(),
+        }
+
+        # A temporary file of its own, so that runs saving the same tenant never write to the same file
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez_compressed(
+                    f,
+                    meta=np.array(json.dumps(meta)),
+                    member_ids=np.array(self.member_ids, dtype=str),
+                    member_idx=self.member_idx,
+                    days=self.days,
+                    counts=self.counts,
+                    scores=self.scores,
+                )
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def is_stale(self, now, rebuild_days):
+        """
+        Whether the rollup should be rebuilt from scratch.
+        Activities that are deleted, moved to another member or inserted late are only picked up by a rebuild.
+
+        Args:
+            now (datetime.datetime): the current time
+            rebuild_days (int): maximum age of the rollup in days
+        """
+        return self.built_at is None or now - self.built_at > timedelta(days=rebuild_days)
+
+    def add_members(self, member_ids):
+        """
+        Add members to the rollup, without any activity.
+
+        Args:
+            member_ids ([str]): IDs of the members
+        """
+        for member_id in member_ids:
+            member_id = str(member_id)
+            if member_id not in self._member_index:
+                self._member_index[member_id] = len(self.member_ids)
+                self.member_ids.append(member_id)
+
+    def fold(self, rows):
+        """
+        Add daily aggregates to the rollup.
+
+        Args:
+            rows ([tuple]): rows of (memberId, day, number of activities, summed score, latest createdAt)
+        """
+        if not rows:
+            return
+
+        member_idx, days, counts, scores = self._arrays(rows)
+        self.member_idx = np.concatenate([self.member_idx, member_idx])
+        self.days = np.concatenate([self.days, days])
+        self.counts = np.concatenate([self.counts, counts])
+        self.scores = np.concatenate([self.scores, scores])
+        self._merge()
+
+    def replace(self, rows):
+        """
+        Set the aggregates of some (member, day) cells, dropping the ones the rollup had for them.
+        Replacing cells with complete aggregates is idempotent, so cells that were already folded can be
+        re-aggregated and replaced safely.
+
+        Args:
+            rows ([tuple]): rows of (memberId, day, number of activities, summed score, latest createdAt)
+        """
+        if not rows:
+            return
+
+        member_idx, days, counts, scores = self._arrays(rows)
+        keep = ~np.isin(self._keys(self.member_idx, self.days), self._keys(member_idx, days))
+        self.member_idx = np.concatenate([self.member_idx[keep], member_idx])
+        self.days = np.concatenate([self.days[keep], days])
+        self.counts = np.concatenate([self.counts[keep], counts])
+        self.scores = np.concatenate([self.scores[keep], scores])
+        self._merge()
+
+    @staticmethod
+    def _keys(member_idx, days):
+        """
+        A single integer key per (member, day) cell, day ordinals fit in 32 bits.
+        """
+        return (member_idx << 32) | days
+
+    def _arrays(self, rows):
+        """
+        Turn daily aggregates into arrays, adding their members to the rollup and moving the watermark.
+
+        Args:
+            rows ([tuple]): rows of (memberId, day, number of activities, summed score, latest createdAt)
+
+        Returns:
+            tuple: (member_idx, days, counts, scores) arrays
+        """
+        member_idx = np.empty(len(rows), dtype=np.int64)
+        days = np.empty(len(rows), dtype=np.int64)
+        counts = np.empty(len(rows), dtype=np.int64)
+        scores = np.empty(len(rows), dtype=np.float64)
+
+        for i, (member_id, day, count, score, created_at) in enumerate(rows):
+            member_id = str(member_id)
+            if member_id not in self._member_index:
+                self._member_index[member_id] = len(self.member_ids)
+                self.member_ids.append(member_id)
+            member_idx[i] = self._member_index[member_id]
+            days[i] = day.toordinal()
+            counts[i] = count
+            scores[i] = score or 0
+            if created_at is not None and (self.watermark is None or created_at > self.watermark):
+                self.watermark = created_at
+
+        return member_idx, days, counts, scores
+
+    def _merge(self):
+        """
+        Sum together the aggregates that belong to the same (member, day).
+        """
+        order = np.lexsort((self.days, self.member_idx))
+        member_idx = self.member_idx[order]
+        days = self.days[order]
+
+        starts = np.flatnonzero(np.concatenate([[True], (member_idx[1:] != member_idx[:-1]) | (days[1:] != days[:-1])]))
+        self.member_idx = member_idx[starts]
+        self.days = days[starts]
+        self.counts = np.add.reduceat(self.counts[order], starts)
+        self.scores = np.add.reduceat(self.scores[order], starts)
+
+    def prune(self, today, window=WINDOW_DAYS):
+        """
+        Drop the days that are older than the scoring window.
+
+        Args:
+            today (datetime.date): last day of the window
+            window (int, optional): number of days in the window. Defaults to WINDOW_DAYS.
+        """
+        keep = self.days >= window_days(today, window)[0]
+        self.member_idx = self.member_idx[keep]
+        self.days = self.days[keep]
+        self.counts = self.counts[keep]
+        self.scores = self.scores[keep]
+
+    def monthly_stats(self, today, member_ids=None):
+        """
+        Monthly engagement of every member, see aggregation.monthly_stats.
+
+        Args:
+            today (datetime.date): last day of the window
+            member_ids ([str], optional): only compute the engagement of these members, the ones that never had
+                                          an activity are left out. Defaults to None (every member).
+
+        Returns:
+            tuple: (member_ids, stats) with the members in the order of the rows of the stats matrices
+        """
+        if member_ids is None:
+            selected = np.arange(len(self.member_ids))
+        else:
+            selected = np.array(
+                [self._member_index[str(m)] for m in member_ids if str(m) in self._member_index], dtype=np.int64
+            )
+
+        # Position of every member of the rollup among the selected members, -1 when not selected
+        position = np.full(len(self.member_ids), -1, dtype=np.int64)
+        position[selected] = np.arange(len(selected))
+        member_idx = position[self.member_idx]
+        keep = member_idx >= 0
+
+        stats = monthly_stats(
+            member_idx[keep], self.days[keep], self.counts[keep], self.scores[keep], len(selected), today
+        )
+        return [self.member_ids[member] for member in selected], stats
@@ -0,0 +1,122 @@
+from datetime import date
+
+import numpy as np
+import pytest
+
+from gitmesh.members_score.aggregation import (
+    DECAY_TABLE_DAYS,
+    DECAY_WEIGHTS,
+    decay_weights,
+    monthly_stats,
+    monthly_stats_from_totals,
+    window_days,
+)
+
+
+def test_decay_weights_table():
+    days = np.arange(DECAY_TABLE_DAYS)
+    assert np.allclose(DECAY_WEIGHTS, 0.9 ** (days / 30), rtol=1e-15, atol=0)
+
+
+def test_decay_weights_match_the_formula():
+    # Inside the table, at its edges, beyond 20 years and in the future
+    days = np.array(
+        [0, 1, 29, 30, 365, DECAY_TABLE_DAYS - 1, DECAY_TABLE_DAYS, 20 * 365 + 1, 30 * 365, 100 * 365, -1, -45]
+    )
+    assert np.allclose(decay_weights(days), 0.9 ** (days / 30), rtol=1e-15, atol=0)
+    for day in days.tolist():
+        assert decay_weights(day) == 0.9 ** (day / 30)
+
+
+@pytest.mark.parametrize("today, window", [(date(2023, 12, 31), 365), (date(2024, 12, 31), 366)])
+def test_monthly_stats_from_totals_match_monthly_stats(today, window):
+    # On a window that starts on the first of a month both compute the same calendar months
+    rng = np.random.default_rng(0)
+    n_members = 20
+    all_days = window_days(today, window)
+    member_idx = rng.integers(n_members, size=2000)
+    days = rng.choice(all_days, size=2000)
+    counts = rng.integers(1, 10, size=2000)
+    scores = rng.random(2000) * 10
+
+    # One aggregate per (member, day), as returned by the scoring query
+    daily = {}
+    for member, day, count, score in zip(member_idx.tolist(), days.tolist(), counts.tolist(), scores.tolist()):
+        total = daily.setdefault((member, day), [0, 0.0])
+        total[0] += count
+        total[1] += score
+    member_idx = np.array([member for member, _ in daily])
+    days = np.array([day for _, day in daily])
+    counts = np.array([count for count, _ in daily.values()])
+    scores = np.array([score for _, score in daily.values()])
+
+    # Monthly totals and sums of squares of the daily activity, as stored by the memberMonthlyEngagement view
+    monthly = {}
+    for (member, day), (count, score) in daily.items():
+        month = date.fromordinal(day).replace(day=1)
+        total = monthly.setdefault((member, month), [0, 0, 0.0, 0.0])
+        total[0] += count
+        total[1] += count * count
+        total[2] += score
+        total[3] += score * score
+    keys = list(monthly)
+    totals = np.array([monthly[key] for key in keys], dtype=np.float64)
+
+    expected = monthly_stats(member_idx, days, counts, scores, n_members, today, window)
+    stats = monthly_stats_from_totals(
+        [member for member, _ in keys],
+        np.array([month for _, month in keys], dtype="datetime64[D]"),
+        totals[:, 0],
+        totals[:, 1],
+        totals[:, 2],
+        totals[:, 3],
+        n_members,
+        today,
+        window,
+    )
+
+    assert len(stats[0]) == 12
+    for actual, wanted in zip(stats, expected):
+        assert np.allclose(actual, wanted, rtol=1e-9, atol=1e-9)
+
+
+@pytest.mark.parametrize(
+    "today, window, n_months",
+    [
+        # Partial first month from October 18th, and the current month up to today
+        (date(2026, 10, 17), 365, 13),
+        # The first month of the window is its first day only
+        (date(2024, 3, 30), 31, 2),
+    ],
+)
+def test_monthly_stats_match_zero_filled_days(today, window, n_months):
+    rng = np.random.default_rng(1)
+    n_members = 5
+    all_days = window_days(today, window)
+    # Days on the edges of the window and outside of it, which are ignored, besides random ones
+    edges = np.array([all_days[0] - 1, all_days[0], all_days[-1], all_days[-1] + 1])
+    days = np.unique(np.concatenate([edges, rng.choice(all_days, size=60)]))
+    member_idx = np.repeat(np.arange(n_members), len(days))
+    days = np.tile(days, n_members)
+    counts = rng.integers(0, 10, size=len(days))
+    scores = rng.random(len(days)) * 10
+
+    stats = monthly_stats(member_idx, days, counts, scores, n_members, today, window)
+
+    # Every day of the window, with 0 on the days without activity, grouped by calendar month
+    months = [date.fromordinal(day).replace(day=1) for day in all_days.tolist()]
+    calendar = sorted(set(months))
+    assert len(calendar) == n_months
+    assert stats[0].tolist() == [month.year for month in calendar]
+    assert stats[1].tolist() == [month.month for month in calendar]
+    for values, mean, std in [(counts, stats[2], stats[4]), (scores, stats[3], stats[5])]:
+        for member in range(n_members):
+            daily = dict.fromkeys(all_days.tolist(), 0.0)
+            for day, value in zip(days[member_idx == member].tolist(), values[member_idx == member].tolist()):
+                if day in daily:
+                    daily[day] += value
+            for j, month in enumerate(calendar):
+                month_values = np.array([daily[day] for day, m in zip(all_days.tolist(), months) if m == month])
+                assert np.isclose(mean[member, j], month_values.mean(), rtol=1e-12, atol=1e-12)
+                expected_std = month_values.std(ddof=1) if len(month_values) > 1 else 0
+                assert np.isclose(std[member, j], expected_std, rtol=1e-9, atol=1e-9)
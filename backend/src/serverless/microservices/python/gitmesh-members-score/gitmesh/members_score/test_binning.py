@@ -0,0 +1,83 @@
+import numpy as np
+
+from gitmesh.members_score import binning
+
+
+def brute_force_sse(x, k):
+    """
+    Lowest within-cluster sum of squares of sorted values, with the O(k n^2) dynamic program.
+    """
+    n = len(x)
+    cost = np.full((n, n), np.inf)
+    for j in range(n):
+        for i in range(j, n):
+            cost[j, i] = ((x[j : i + 1] - x[j : i + 1].mean()) ** 2).sum()
+
+    best = cost[0].copy()
+    for m in range(1, k):
+        best = np.array([min([best[j - 1] + cost[j, i] for j in range(m, i + 1)] or [np.inf]) for i in range(n)])
+    return best[n - 1]
+
+
+def sse(values, labels):
+    return sum(((values[labels == level] - values[labels == level].mean()) ** 2).sum() for level in np.unique(labels))
+
+
+def test_ckmeans_is_optimal():
+    rng = np.random.default_rng(0)
+    for _ in range(20):
+        values = np.round(rng.exponential(10, size=rng.integers(10, 40)), 1)
+        k = int(rng.integers(2, 6))
+        labels, centers = binning.ckmeans(values, k)
+
+        assert len(centers) == min(k, len(np.unique(values)))
+        assert np.isclose(sse(values, labels), brute_force_sse(np.sort(values), len(centers)))
+
+
+def test_ckmeans_is_deterministic_and_ordered():
+    values = np.random.default_rng(1).lognormal(size=1000)
+    labels, centers = binning.ckmeans(values, 10)
+    again, _ = binning.ckmeans(values, 10)
+
+    assert (labels == again).all()
+    assert (np.diff(centers) > 0).all()
+    # Higher values never get a lower level
+    order = np.argsort(values)
+    assert (np.diff(labels[order]) >= 0).all()
+
+
+def test_ckmeans_with_fewer_distinct_values_than_clusters():
+    labels, centers = binning.ckmeans([1, 1, 5, 5, 5], 10)
+
+    assert list(labels) == [0, 0, 1, 1, 1]
+    assert list(centers) == [1, 5]
+
+
+def test_methods_agree_on_separated_values():
+    values = np.concatenate([np.full(10, 1.0), np.full(10, 50.0), np.full(10, 100.0)])
+    for method in binning.METHODS:
+        labels, _ = binning.cluster(values, 3, method=method)
+        assert list(labels) == [0] * 10 + [1] * 10 + [2] * 10
+
+
+def test_level_boundaries_give_back_the_labels():
+    values = np.random.default_rng(2).lognormal(size=500)
+    for method in ["ckmeans", "quantile"]:
+        labels, _ = binning.cluster(values, 10, method=method)
+        assert (binning.assign(values, binning.level_boundaries(values, labels)) == labels).all()
+
+
+def test_sampled_fit():
+    values = np.round(np.random.default_rng(3).lognormal(mean=1.0, sigma=1.5, size=200000), 2)
+    labels, centers = binning.cluster(values, 10, method="ckmeans")
+    sampled_labels, sampled_centers = binning.cluster(values, 10, method="ckmeans", sample_size=20000)
+
+    assert len(sampled_centers) == len(centers)
+    assert (sampled_labels == labels).mean() > 0.95
+    # The levels stay ordered by value
+    order = np.argsort(values)
+    assert (np.diff(sampled_labels[order]) >= 0).all()
+
+    # No sampling below the sample size
+    small = values[:1000]
+    assert (binning.cluster(small, 10, sample_size=20000)[0] == binning.cluster(small, 10)[0]).all()
@@ -0,0 +1,49 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from gitmesh.members_score.levels import EngagementLevels
+
+
+def test_levels_round_trip(tmp_path):
+    values = np.random.default_rng(0).lognormal(size=2000)
+    levels = EngagementLevels("tenant", state_dir=tmp_path)
+    levels.fit(values, 10, method="ckmeans")
+    levels.save()
+
+    loaded = EngagementLevels("tenant", state_dir=tmp_path)
+    assert loaded.load()
+    assert loaded.fits(10, "ckmeans")
+    assert not loaded.fits(10, "kmeans")
+    assert (loaded.assign(values) == levels.assign(values)).all()
+    assert not EngagementLevels("other", state_dir=tmp_path).load()
+
+
+def test_concurrent_saves(tmp_path):
+    # A tenant run and a rescore of the same tenant may save at the same time
+    rng = np.random.default_rng(2)
+    fitted = []
+    for _ in range(8):
+        levels = EngagementLevels("tenant", state_dir=tmp_path)
+        levels.fit(rng.lognormal(size=500), 10)
+        fitted.append(levels)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda levels: [levels.save() for _ in range(20)], fitted))
+
+    loaded = EngagementLevels("tenant", state_dir=tmp_path)
+    assert loaded.load()
+    assert any((loaded.bounds == levels.bounds).all() for levels in fitted)
+    assert os.listdir(tmp_path / "tenant") == ["engagement_levels.json"]
+
+
+def test_levels_drift():
+    rng = np.random.default_rng(1)
+    levels = EngagementLevels("tenant")
+    levels.fit(rng.lognormal(size=5000), 10)
+
+    # Same distribution, new draw
+    assert levels.drift(rng.lognormal(size=5000)) < 0.1
+    # Everyone is twice as engaged
+    assert levels.drift(2 * rng.lognormal(size=5000)) > 0.1
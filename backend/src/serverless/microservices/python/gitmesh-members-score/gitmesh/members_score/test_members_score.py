@@ -1,5 +1,15 @@
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+from dateutil import parser
+
 from gitmesh.backend.repository import Repository
 from gitmesh.members_score import MembersScore
+from gitmesh.members_score import members_score as members_score_module
+from gitmesh.members_score.members_score import SCORING_INDEX, _parse_timestamp
+from gitmesh.members_score.aggregation import monthly_rows
+from gitmesh.members_score.rollup import ActivityRollup
 
 
 def test_calculate_member_score(api: "Repository"):
@@ -55,3 +65,273 @@ def test_check_specific_member_scores(api: "Repository"):
     assert updates_str["f97995cd-6400-49e9-84a6-6ef9f38ffbf6"] == 6
     assert updates_str["f2e355ed-3a45-4b63-b228-59ee7aeafe0c"] == 7
     assert updates_str["bc6665c0-203c-4d9c-b95f-07877df7f9be"] == 1
+
+
+def test_rollup_scores_match_activities_scores(api: "Repository", tmp_path):
+
+    id = "b044af41-657a-4925-9541-cf8dfbdc687b"
+    api.set_tenant_id(id)
+
+    updates = MembersScore(api.tenant_id, api, send=False).main()
+    rollup_updates = MembersScore(api.tenant_id, api, send=False, source="rollup", state_dir=tmp_path).main()
+
+    assert rollup_updates == updates
+
+
+def test_rescore_matches_tenant_run(api: "Repository", tmp_path):
+
+    id = "b044af41-657a-4925-9541-cf8dfbdc687b"
+    api.set_tenant_id(id)
+
+    updates = MembersScore(api.tenant_id, api, send=False, source="rollup", levels=True, state_dir=tmp_path).main()
+    member_ids = list(updates)[:5]
+
+    rescored = MembersScore(api.tenant_id, api, send=False, source=None, levels=True, state_dir=tmp_path).rescore(
+        member_ids
+    )
+
+    assert rescored == {member_id: updates[member_id] for member_id in member_ids}
+
+
+def test_score_arrays_match_calculate_member_score():
+    rng = np.random.default_rng(0)
+    # The first month of the window is the month of the run of the previous year on October 17th
+    for now in [datetime(2026, 10, 17, 13), datetime(2024, 2, 29, 1), datetime(2023, 12, 31, 23)]:
+        member_ids = [f"member-{i}" for i in range(50)]
+        rollup = ActivityRollup("tenant")
+        rollup.add_members(member_ids)
+        days = [(now - timedelta(days=int(age))).date() for age in rng.integers(400, size=3000)]
+        members = rng.integers(50, size=3000)
+        rollup.fold([(member_ids[i], day, 2, score, None) for i, day, score in zip(members, days, rng.random(3000))])
+
+        members_score = MembersScore("tenant", repository=object(), source=None)
+        members_score.now = now
+        members_score.member_ids, members_score.stats = rollup.monthly_stats(now.date())
+        index, totals = members_score._raw_score_arrays()
+
+        expected = dict.fromkeys(member_ids, 0)
+        for i, row in enumerate(monthly_rows(members_score.member_ids, members_score.stats)):
+            expected[row[0]] += members_score.calculate_member_score(i, row)
+
+        assert np.allclose(totals, [expected[member_id] for member_id in index], rtol=1e-12, atol=0)
+
+
+class FakeResult(list):
+    def first(self):
+        return self[0] if self else None
+
+    def fetchall(self):
+        return list(self)
+
+
+class FakeEngine:
+    """
+    Engine answering the index lookup and the EXPLAIN of check_scoring_index, and rows to any other query.
+    """
+
+    def __init__(self, index_exists, plan, rows=()):
+        self.index_exists = index_exists
+        self.plan = plan
+        self.rows = list(rows)
+        self.queries = []
+        self.params = []
+
+    def connect(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def execute(self, query, params):
+        query = str(query)
+        self.queries.append(query)
+        self.params.append(params)
+        if "pg_indexes" in query:
+            return FakeResult([(1,)] if self.index_exists else [])
+        if query.startswith("explain"):
+            return FakeResult((line,) for line in self.plan)
+        return FakeResult(self.rows)
+
+
+class FakeRepository:
+    tenant_id = "f5c97d75-b919-4be6-9e57-b851efb336a1"
+
+    def __init__(self, engine=None, members=()):
+        self.engine = engine
+        self.members = list(members)
+
+    def paginate(self, table, fields=None, page_size=1000):
+        for i in range(0, len(self.members), page_size):
+            yield self.members[i : i + page_size]
+
+    def find_members_by_id(self, member_ids, fields=None):
+        assert fields == ["id", "score", "attributes.isTeamMember.default"]
+        return [member for member in self.members if member[0] in member_ids]
+
+
+def mock_members_controller(monkeypatch):
+    """
+    Collect the score updates instead of sending them.
+    """
+    sent = []
+    monkeypatch.setattr(
+        members_score_module.MembersController, "__init__", lambda self, tenant_id, repository=False: None
+    )
+    monkeypatch.setattr(
+        members_score_module.MembersController,
+        "update",
+        lambda self, updates, send=True, chunk_size=None: sent.extend(updates) or 1,
+    )
+    return sent
+
+
+@pytest.mark.parametrize(
+    "index_exists, plan, used",
+    [
+        (True, [f"Bitmap Index Scan on {SCORING_INDEX}", "  Index Cond: (tenantId = ...)"], True),
+        (True, ["Seq Scan on activities"], False),
+        (False, [], False),
+    ],
+)
+def test_check_scoring_index(index_exists, plan, used):
+    engine = FakeEngine(index_exists, plan)
+    members_score = MembersScore("tenant", repository=FakeRepository(engine), source=None)
+
+    assert members_score.check_scoring_index() is used
+    assert any(query.startswith("explain") for query in engine.queries) is index_exists
+
+
+def test_fetch_scores_checks_the_index_once():
+    engine = FakeEngine(True, [f"Index Scan using {SCORING_INDEX} on activities"])
+    MembersScore("tenant", repository=FakeRepository(engine))
+
+    assert sum("pg_indexes" in query for query in engine.queries) == 1
+
+
+def test_main_resets_members_without_activity(monkeypatch):
+    sent = mock_members_controller(monkeypatch)
+
+    now = datetime(2026, 10, 17, 13)
+    rollup = ActivityRollup("tenant")
+    rollup.fold([("active", (now - timedelta(days=3)).date(), 2, 5.0, None)])
+    members = [("active", None, None), ("inactive", 4, None), ("never-scored", 0, None), ("unknown", None, None)]
+
+    members_score = MembersScore("tenant", repository=FakeRepository(members=members), source=None, send=False)
+    members_score.now = now
+    members_score.member_ids, members_score.stats = rollup.monthly_stats(now.date())
+
+    assert members_score.main() == {"active": 1, "inactive": 0}
+    assert sent == [{"id": "active", "update": {"score": 1}}, {"id": "inactive", "update": {"score": 0}}]
+
+
+def test_updated_rollup_overlaps_the_watermark(tmp_path):
+    now = datetime(2026, 10, 17, 13)
+    watermark = datetime(2026, 10, 17, 12)
+    rollup = ActivityRollup("tenant", state_dir=tmp_path)
+    rollup.built_at = now - timedelta(days=1)
+    rollup.fold([("a", now.date(), 2, 3.0, watermark), ("b", now.date(), 1, 1.0, watermark)])
+    rollup.save()
+
+    # An activity of a committed after the previous run, with a createdAt behind its watermark
+    engine = FakeEngine(True, [], rows=[("a", now.date(), 3, 4.0, watermark - timedelta(minutes=10))])
+    members_score = MembersScore("tenant", repository=FakeRepository(engine), source=None, state_dir=tmp_path)
+    members_score.now = now
+    updated = members_score._updated_rollup(now)
+
+    assert engine.queries == [members_score_module.ROLLUP_DELTA_QUERY]
+    assert engine.params[0]["created_since"] == watermark - timedelta(minutes=60)
+    assert engine.params[0]["since"] == members_score._window_start()
+    # The day of a is replaced, not added to
+    a, b = updated.member_ids.index("a"), updated.member_ids.index("b")
+    assert updated.counts[updated.member_idx == a].tolist() == [3]
+    assert updated.counts[updated.member_idx == b].tolist() == [1]
+    assert updated.watermark == watermark
+
+    # A stale rollup is rebuilt from the scoring window only
+    engine = FakeEngine(True, [], rows=[("a", now.date(), 3, 4.0, watermark)])
+    members_score = MembersScore("tenant", repository=FakeRepository(engine), source=None, state_dir=tmp_path)
+    members_score._updated_rollup(now + timedelta(days=8))
+    assert engine.queries == [members_score_module.ROLLUP_QUERY]
+    assert "since" in engine.params[0]
+
+
+def test_rescore_with_persisted_levels(monkeypatch, tmp_path):
+    sent = mock_members_controller(monkeypatch)
+    now = datetime(2026, 10, 17, 13)
+    member_ids = [f"member-{i}" for i in range(20)]
+
+    # A previous tenant run persisted the rollup and fitted the engagement levels
+    rollup = ActivityRollup("tenant", state_dir=tmp_path)
+    rollup.built_at = now
+    rollup.fold(
+        [(member_id, (now - timedelta(days=i)).date(), i + 1, i + 1.0, now) for i, member_id in enumerate(member_ids)]
+    )
+    rollup.save()
+    tenant_run = MembersScore("tenant", repository=object(), source=None, levels=True, state_dir=tmp_path)
+    tenant_run.now = now
+    tenant_run.member_ids, tenant_run.stats = rollup.monthly_stats(now.date())
+    index, raw_scores = tenant_run._raw_score_arrays()
+    levels = dict(zip(index, tenant_run._normalise_array(raw_scores).tolist()))
+
+    members = [("member-3", 0, None), ("member-7", levels["member-7"], None), ("member-9", 5, True)]
+    repository = FakeRepository(FakeEngine(True, []), members=members)
+    members_score = MembersScore("tenant", repository=repository, source=None, levels=True, state_dir=tmp_path)
+    members_score.now = now
+
+    assert members_score.rescore(["member-3", "member-7", "member-9"]) == {
+        "member-3": levels["member-3"],
+        "member-7": levels["member-7"],
+        # Team members get the lowest level, as in a tenant run
+        "member-9": 1,
+    }
+    assert sent == [
+        {"id": "member-3", "update": {"score": levels["member-3"]}},
+        {"id": "member-9", "update": {"score": 1}},
+    ]
+
+
+def test_rescore_without_persisted_levels(tmp_path):
+    class NoRepository:
+        def find_members_by_id(self, member_ids, fields=None):
+            raise AssertionError("members are not fetched without persisted levels")
+
+    for levels in [False, True]:
+        members_score = MembersScore(
+            "tenant", repository=NoRepository(), source=None, levels=levels, state_dir=tmp_path
+        )
+        assert members_score.rescore(["member-1"]) == {}
+
+
+@pytest.mark.parametrize(
+    "value",
+    [
+        "2023-01-02T03:04:05",
+        "2023-01-02 03:04:05.123456",
+        "2023-01-02T03:04:05Z",
+        "2023-01-02T03:04:05.123Z",
+        "2023-01-02T03:04:05+02:00",
+        "2023-01-02",
+        "Mon, 02 Jan 2023 03:04:05 GMT",
+        "January 2nd 2023 3:04am",
+    ],
+)
+def test_parse_timestamp_matches_dateutil(value):
+    # Timestamps are parsed as dateutil did, keeping the wall time and dropping the timezone
+    assert _parse_timestamp(value) == parser.parse(value).replace(tzinfo=None)
+    assert _parse_timestamp(value).tzinfo is None
+
+
+def test_parse_timestamp_datetimes():
+    naive = datetime(2023, 1, 2, 3, 4, 5)
+    assert _parse_timestamp(naive) == naive
+    aware = datetime(2023, 1, 2, 3, 4, 5, tzinfo=timezone(timedelta(hours=2)))
+    assert _parse_timestamp(aware) == naive
+    assert _parse_timestamp(aware).tzinfo is None
+
+
+def test_parse_timestamp_epoch():
+    assert _parse_timestamp(1672628645) == datetime(2023, 1, 2, 3, 4, 5)
+    assert _parse_timestamp(1672628645.5) == datetime(2023, 1, 2, 3, 4, 5, 500000)
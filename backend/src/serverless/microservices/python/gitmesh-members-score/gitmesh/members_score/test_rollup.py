@@ -0,0 +1,91 @@
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+from gitmesh.members_score.aggregation import WINDOW_DAYS
+from gitmesh.members_score.rollup import ActivityRollup
+
+TODAY = date(2026, 10, 17)
+
+
+def cells(rollup):
+    """
+    The (member, day) -> (count, score) cells of a rollup.
+    """
+    return {
+        (rollup.member_ids[member], date.fromordinal(int(day))): (int(count), float(score))
+        for member, day, count, score in zip(rollup.member_idx, rollup.days, rollup.counts, rollup.scores)
+    }
+
+
+def test_fold_sums_the_same_cells():
+    rollup = ActivityRollup("tenant")
+    rollup.fold([("a", TODAY, 1, 2.0, datetime(2026, 10, 17, 1)), ("b", TODAY, 3, 1.5, None)])
+    rollup.fold([("a", TODAY, 2, 1.0, datetime(2026, 10, 16)), ("a", TODAY - timedelta(days=1), 1, None, None)])
+
+    assert cells(rollup) == {
+        ("a", TODAY): (3, 3.0),
+        ("a", TODAY - timedelta(days=1)): (1, 0.0),
+        ("b", TODAY): (3, 1.5),
+    }
+    assert rollup.member_ids == ["a", "b"]
+    # The watermark is the latest createdAt folded so far
+    assert rollup.watermark == datetime(2026, 10, 17, 1)
+
+
+def test_replace_is_idempotent():
+    rollup = ActivityRollup("tenant")
+    rollup.fold([("a", TODAY, 1, 2.0, datetime(2026, 10, 17, 1)), ("b", TODAY, 3, 1.5, datetime(2026, 10, 17, 2))])
+
+    # The cell of a got a late activity, its whole day is aggregated again
+    delta = [("a", TODAY, 2, 5.0, datetime(2026, 10, 17, 3)), ("c", TODAY, 1, 1.0, datetime(2026, 10, 17, 3))]
+    rollup.replace(delta)
+    replaced = cells(rollup)
+    rollup.replace(delta)
+
+    assert cells(rollup) == replaced == {("a", TODAY): (2, 5.0), ("b", TODAY): (3, 1.5), ("c", TODAY): (1, 1.0)}
+    assert rollup.watermark == datetime(2026, 10, 17, 3)
+
+
+def test_prune_keeps_the_members():
+    rollup = ActivityRollup("tenant")
+    old = TODAY - timedelta(days=WINDOW_DAYS)
+    rollup.fold([("a", old, 1, 1.0, None), ("b", old + timedelta(days=1), 1, 1.0, None), ("b", TODAY, 1, 1.0, None)])
+    rollup.prune(TODAY)
+
+    assert cells(rollup) == {("b", old + timedelta(days=1)): (1, 1.0), ("b", TODAY): (1, 1.0)}
+    assert rollup.member_ids == ["a", "b"]
+
+
+def test_save_and_load(tmp_path):
+    rollup = ActivityRollup("tenant", state_dir=tmp_path)
+    rollup.built_at = datetime(2026, 10, 17, 12)
+    rollup.add_members(["inactive"])
+    rollup.fold([("a", TODAY, 1, 2.5, datetime(2026, 10, 17, 1)), ("b", TODAY, 3, 1.5, None)])
+    rollup.save()
+
+    loaded = ActivityRollup("tenant", state_dir=tmp_path)
+    assert loaded.load()
+    assert cells(loaded) == cells(rollup)
+    assert loaded.member_ids == ["inactive", "a", "b"]
+    assert loaded.watermark == rollup.watermark
+    assert loaded.built_at == rollup.built_at
+    assert not loaded.is_stale(datetime(2026, 10, 20), 7)
+    assert loaded.is_stale(datetime(2026, 10, 25), 7)
+    # Members added after a load keep their position after the loaded ones
+    loaded.fold([("c", TODAY, 1, 1.0, None)])
+    assert loaded.member_ids == ["inactive", "a", "b", "c"]
+    assert not ActivityRollup("other", state_dir=tmp_path).load()
+
+
+def test_monthly_stats_of_some_members():
+    rollup = ActivityRollup("tenant")
+    rollup.fold([("a", TODAY, 1, 2.0, None), ("b", TODAY, 2, 4.0, None), ("c", TODAY, 3, 6.0, None)])
+
+    member_ids, stats = rollup.monthly_stats(TODAY, member_ids=["c", "unknown", "a"])
+    all_member_ids, all_stats = rollup.monthly_stats(TODAY)
+
+    assert member_ids == ["c", "a"]
+    assert all_member_ids == ["a", "b", "c"]
+    for matrix, all_matrix in zip(stats, all_stats):
+        assert np.array_equal(matrix, all_matrix[[2, 0]] if all_matrix.ndim == 2 else all_matrix)
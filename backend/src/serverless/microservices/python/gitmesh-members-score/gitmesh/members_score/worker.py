@@ -1,5 +1,30 @@
+from gitmesh.backend.infrastructure.config import (
+    MEMBERS_SCORE_SOURCE,
+    MEMBERS_SCORE_BINNING,
+    MEMBERS_SCORE_BINNING_SAMPLE_SIZE,
+    MEMBERS_SCORE_LEVELS,
+)
 from gitmesh.members_score import MembersScore
 
 
 def members_score_worker(tenant_id):
-    MembersScore(tenant_id).main()
+    MembersScore(
+        tenant_id,
+        source=MEMBERS_SCORE_SOURCE,
+        binning=MEMBERS_SCORE_BINNING,
+        sample_size=MEMBERS_SCORE_BINNING_SAMPLE_SIZE,
+        levels=MEMBERS_SCORE_LEVELS,
+    ).main(return_scores=False)
+
+
+def members_rescore_worker(tenant_id, member_ids):
+    # Members are rescored against the persisted engagement levels, there are none to use while they are disabled
+    if not MEMBERS_SCORE_LEVELS:
+        return
+    MembersScore(
+        tenant_id,
+        source=None,
+        binning=MEMBERS_SCORE_BINNING,
+        sample_size=MEMBERS_SCORE_BINNING_SAMPLE_SIZE,
+        levels=MEMBERS_SCORE_LEVELS,
+    ).rescore(member_ids)
@@ -1,40 +1,287 @@
+import asyncio
 import json
+import multiprocessing
+import signal
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
 
 from gitmesh.backend.enums import Services
-from gitmesh.backend.infrastructure import SQS
-from gitmesh.backend.infrastructure.config import PYTHON_WORKER_QUEUE
+from gitmesh.backend.infrastructure import SQS, Acknowledger, AsyncSQS, VisibilityHeartbeat
+from gitmesh.backend.infrastructure.config import (
+    PYTHON_WORKER_ASYNC,
+    PYTHON_WORKER_QUEUE,
+    PYTHON_WORKER_CONCURRENCY,
+    PYTHON_WORKER_VISIBILITY_TIMEOUT,
+)
 from gitmesh.backend.infrastructure.logging import get_logger
 from gitmesh.backend.utils.coordinator import base_coordinator
-from gitmesh.members_score import members_score_worker
+from gitmesh.members_score import members_score_worker, members_rescore_worker
 
 logger = get_logger(__name__)
 
 sqs = SQS(PYTHON_WORKER_QUEUE)
+# Processed messages are deleted in batches
+acknowledger = Acknowledger(sqs)
 
-logger.info(f"Listening for messages on: {PYTHON_WORKER_QUEUE}")
+stopping = False
 
-while True:
-    msg = sqs.receive_message(delete=False, wait_time_seconds=15)
-    if msg is not None:
-        msg_receipt = msg['ReceiptHandle']
 
+def stop(signum, frame):
+    """
+    Stop receiving new messages, the messages that are being processed are drained before exiting.
+    """
+    global stopping
+    stopping = True
+    logger.info(f"Received signal {signum}, draining the worker")
+
+
+def ignore_signals():
+    """
+    Pool processes leave the shutdown to the main process, which waits for them to finish their job.
+    """
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def new_pool(concurrency):
+    """
+    Start a pool of processes to score tenants in.
+    The processes are started by a fork server instead of being forked from the worker, whose acknowledger and
+    heartbeat threads could be holding a lock at the time of the fork and deadlock the child.
+
+    Args:
+        concurrency (int): number of processes
+    """
+    return ProcessPoolExecutor(
+        max_workers=concurrency, mp_context=multiprocessing.get_context("forkserver"), initializer=ignore_signals
+    )
+
+
+def run():
+    """
+    Process one message at a time.
+    Messages are deleted only once they were processed successfully. A message whose job failed, or whose worker
+    died, becomes visible again after the visibility timeout and is retried.
+    """
+    while not stopping:
+        msg = sqs.receive_message(
+            delete=False, wait_time_seconds=15, visibility_timeout=PYTHON_WORKER_VISIBILITY_TIMEOUT
+        )
+        if msg is not None:
+            msg_receipt = msg['ReceiptHandle']
+
+            body = json.loads(msg['Body'])
+            msg_type = body.get('type', '')
+            service = body.get('service', '')
+            tenant_id = body.get('tenant', '')
+
+            try:
+                if service == Services.MEMBERS_SCORE.value:
+                    logger.info("triggering members_score")
+                    with VisibilityHeartbeat(sqs, msg_receipt, PYTHON_WORKER_VISIBILITY_TIMEOUT):
+                        members_score_worker(tenant_id)
+                    acknowledger.ack(msg_receipt)
+
+                elif msg_type == Services.MEMBERS_SCORE.value:
+                    logger.info("triggering members_score coordinator")
+                    with VisibilityHeartbeat(sqs, msg_receipt, PYTHON_WORKER_VISIBILITY_TIMEOUT):
+                        base_coordinator(str(Services.MEMBERS_SCORE.value))
+                    acknowledger.ack(msg_receipt)
+
+                elif msg_type == Services.MEMBERS_RESCORE.value:
+                    logger.info(f"triggering members_rescore of {len(body.get('members', []))} members")
+                    with VisibilityHeartbeat(sqs, msg_receipt, PYTHON_WORKER_VISIBILITY_TIMEOUT):
+                        members_rescore_worker(tenant_id, body.get('members', []))
+                    acknowledger.ack(msg_receipt)
+
+                else:
+                    logger.error(f"Error while processing a queue message! Unrecognized message format: {body}")
+
+            except Exception as e:
+                logger.error(f"Error while processing a queue message, it will be retried: {e}")
+
+
+def run_concurrent(concurrency):
+    """
+    Receive up to 10 messages at a time and score tenants in a pool of processes.
+    While a tenant is being scored the visibility timeout of its message is extended by a heartbeat,
+    and the message is deleted only once the job succeeded. When a pool process dies the pool is broken,
+    its jobs fail and are retried, and a new pool is started.
+
+    Args:
+        concurrency (int): number of tenants scored in parallel
+    """
+    in_flight = {}
+
+    def submit(msg, fn, *args):
+        try:
+            future = pool.submit(fn, *args)
+        except BrokenProcessPool as e:
+            logger.error(f"Could not submit a job to the process pool, it will be retried: {e}")
+            return False
+        heartbeat = VisibilityHeartbeat(sqs, msg['ReceiptHandle'], PYTHON_WORKER_VISIBILITY_TIMEOUT).start()
+        in_flight[future] = (msg['ReceiptHandle'], args[0], heartbeat, pool)
+        return True
+
+    pool = new_pool(concurrency)
+    try:
+        while not stopping or in_flight:
+            free = concurrency - len(in_flight)
+            if not stopping and free > 0:
+                messages = sqs.receive_messages(
+                    max_number=min(10, free),
+                    wait_time_seconds=1 if in_flight else 15,
+                    visibility_timeout=PYTHON_WORKER_VISIBILITY_TIMEOUT,
+                )
+            else:
+                messages = []
+
+            broken = False
+            for msg in messages:
+                body = json.loads(msg['Body'])
+                msg_type = body.get('type', '')
+                service = body.get('service', '')
+                tenant_id = body.get('tenant', '')
+
+                if service == Services.MEMBERS_SCORE.value:
+                    logger.info(f"triggering members_score for tenant {tenant_id}")
+                    broken |= not submit(msg, members_score_worker, tenant_id)
+
+                elif msg_type == Services.MEMBERS_RESCORE.value:
+                    logger.info(f"triggering members_rescore of {len(body.get('members', []))} members")
+                    broken |= not submit(msg, members_rescore_worker, tenant_id, body.get('members', []))
+
+                elif msg_type == Services.MEMBERS_SCORE.value:
+                    logger.info("triggering members_score coordinator")
+                    try:
+                        # A fan-out that outlives the visibility timeout must not be redelivered and run twice
+                        with VisibilityHeartbeat(sqs, msg['ReceiptHandle'], PYTHON_WORKER_VISIBILITY_TIMEOUT):
+                            base_coordinator(str(Services.MEMBERS_SCORE.value))
+                        acknowledger.ack(msg['ReceiptHandle'])
+                    except Exception as e:
+                        logger.error(f"Error while running the members_score coordinator, it will be retried: {e}")
+
+                else:
+                    logger.error(f"Error while processing a queue message! Unrecognized message format: {body}")
+
+            if in_flight:
+                done, _ = wait(in_flight, timeout=0 if messages else 1, return_when=FIRST_COMPLETED)
+            else:
+                done = set()
+            for future in done:
+                msg_receipt, tenant_id, heartbeat, future_pool = in_flight.pop(future)
+                heartbeat.stop()
+                if future.exception() is None:
+                    acknowledger.ack(msg_receipt)
+                else:
+                    logger.error(
+                        f"Error while scoring the members of tenant {tenant_id}, it will be retried: "
+                        f"{future.exception()}"
+                    )
+                    # Jobs of a pool that was already replaced don't break the new one
+                    broken |= isinstance(future.exception(), BrokenProcessPool) and future_pool is pool
+
+            if broken:
+                logger.warning("A process of the pool died, starting a new pool")
+                pool.shutdown(wait=False)
+                pool = new_pool(concurrency)
+    finally:
+        pool.shutdown(wait=True)
+
+
+async def run_async(concurrency):
+    """
+    Process up to concurrency messages at a time on an asyncio event loop.
+    Tenants are scored in a pool of processes, while a long poll for the next messages stays in flight.
+    When a pool process dies the pool is broken, its jobs fail and are retried, and a new pool is started.
+
+    Args:
+        concurrency (int): number of messages processed in parallel
+    """
+    loop = asyncio.get_running_loop()
+    async_sqs = AsyncSQS(sqs)
+    stop_event = asyncio.Event()
+
+    async def watch_stop():
+        while not stopping:
+            await asyncio.sleep(1)
+        stop_event.set()
+
+    pool = new_pool(concurrency)
+
+    async def run_in_pool(fn, *args):
+        nonlocal pool
+        current = pool
+        try:
+            return await loop.run_in_executor(current, fn, *args)
+        except BrokenProcessPool:
+            # Jobs of a pool that was already replaced don't break the new one
+            if current is pool:
+                logger.warning("A process of the pool died, starting a new pool")
+                current.shutdown(wait=False)
+                pool = new_pool(concurrency)
+            raise
+
+    async def handle(msg):
         body = json.loads(msg['Body'])
         msg_type = body.get('type', '')
         service = body.get('service', '')
         tenant_id = body.get('tenant', '')
-        microservice_id = body.get('microservice_id', '')
-        member = body.get('member', '')
-        params = body.get('params', None)
 
-        if service == Services.MEMBERS_SCORE.value:
-            sqs.delete_message(msg_receipt)
-            logger.info("triggering members_score")
-            members_score_worker(tenant_id)
+        try:
+            if service == Services.MEMBERS_SCORE.value:
+                logger.info(f"triggering members_score for tenant {tenant_id}")
+                with VisibilityHeartbeat(sqs, msg['ReceiptHandle'], PYTHON_WORKER_VISIBILITY_TIMEOUT):
+                    await run_in_pool(members_score_worker, tenant_id)
 
-        elif msg_type == Services.MEMBERS_SCORE.value:
-            sqs.delete_message(msg_receipt)
-            logger.info("triggering members_score coordinator")
-            base_coordinator(str(Services.MEMBERS_SCORE.value))
+            elif msg_type == Services.MEMBERS_SCORE.value:
+                logger.info("triggering members_score coordinator")
+                with VisibilityHeartbeat(sqs, msg['ReceiptHandle'], PYTHON_WORKER_VISIBILITY_TIMEOUT):
+                    await loop.run_in_executor(None, base_coordinator, str(Services.MEMBERS_SCORE.value))
 
+            elif msg_type == Services.MEMBERS_RESCORE.value:
+                logger.info(f"triggering members_rescore of {len(body.get('members', []))} members")
+                with VisibilityHeartbeat(sqs, msg['ReceiptHandle'], PYTHON_WORKER_VISIBILITY_TIMEOUT):
+                    await run_in_pool(members_rescore_worker, tenant_id, body.get('members', []))
+
+            else:
+                logger.error(f"Error while processing a queue message! Unrecognized message format: {body}")
+                return
+
+            acknowledger.ack(msg['ReceiptHandle'])
+
+        except Exception as e:
+            logger.error(f"Error while processing a queue message, it will be retried: {e}")
+
+    watcher = asyncio.ensure_future(watch_stop())
+    try:
+        await async_sqs.consume(
+            handle,
+            concurrency=concurrency,
+            wait_time_seconds=15,
+            visibility_timeout=PYTHON_WORKER_VISIBILITY_TIMEOUT,
+            stop=stop_event,
+        )
+    finally:
+        watcher.cancel()
+        pool.shutdown(wait=True)
+
+    async_sqs.close()
+
+
+# The fork server imports this module in the pool processes, which must not start a worker of their own
+if __name__ == "__main__":
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    logger.info(f"Listening for messages on: {PYTHON_WORKER_QUEUE}")
+
+    with acknowledger:
+        if PYTHON_WORKER_ASYNC:
+            asyncio.run(run_async(PYTHON_WORKER_CONCURRENCY))
+        elif PYTHON_WORKER_CONCURRENCY > 1:
+            run_concurrent(PYTHON_WORKER_CONCURRENCY)
         else:
-            logger.error(f"Error while processing a queue message! Unrecognized message format: {body}")
+            run()
+
+    logger.info("Worker stopped")
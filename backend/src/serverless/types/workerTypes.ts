@@ -9,10 +9,12 @@ export enum NodeWorkerMessageType {
 
 export enum PythonWorkerMessageType {
   MEMBERS_SCORE = 'members_score',
+  MEMBERS_RESCORE = 'members_rescore',
 }
 
 export interface PythonWorkerMessage {
   type: PythonWorkerMessageType
   member?: string
+  members?: string[]
   tenant?: string
 }
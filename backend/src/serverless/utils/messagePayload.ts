@@ -0,0 +1,46 @@
+import { SqsMessage } from '@gitmesh/sqs'
+import * as fs from 'fs'
+import * as zlib from 'zlib'
+
+// Message attributes set by the python worker on compressed or claim-checked message bodies
+export const CONTENT_ENCODING_ATTRIBUTE = 'contentEncoding'
+export const PAYLOAD_PATH_ATTRIBUTE = 'payloadPath'
+export const MESSAGE_PAYLOAD_ATTRIBUTES = [CONTENT_ENCODING_ATTRIBUTE, PAYLOAD_PATH_ATTRIBUTE]
+
+/**
+ * Returns the JSON body of a received message.
+ * Bodies compressed by the producer are base64 encoded gzip, and bodies too large for a message
+ * are stored in the claim check directory and only their path is sent.
+ */
+export const decodeMessageBody = (message: SqsMessage): string => {
+  const attributes = message.MessageAttributes || {}
+  const encoding = attributes[CONTENT_ENCODING_ATTRIBUTE]?.StringValue
+  const payloadPath = attributes[PAYLOAD_PATH_ATTRIBUTE]?.StringValue
+
+  let data: Buffer
+  if (payloadPath) {
+    data = fs.readFileSync(payloadPath)
+  } else if (encoding) {
+    data = Buffer.from(message.Body, 'base64')
+  } else {
+    return message.Body
+  }
+
+  if (encoding === 'gzip') {
+    data = zlib.gunzipSync(data)
+  } else if (encoding) {
+    throw new Error(`Unsupported message content encoding: ${encoding}`)
+  }
+
+  return data.toString('utf-8')
+}
+
+/**
+ * Removes the claim-checked body of a message, once the message was removed from the queue.
+ */
+export const removeMessagePayload = (message: SqsMessage): void => {
+  const payloadPath = message.MessageAttributes?.[PAYLOAD_PATH_ATTRIBUTE]?.StringValue
+  if (payloadPath) {
+    fs.rmSync(payloadPath, { force: true })
+  }
+}
@@ -7,6 +7,7 @@ import { SQS_CLIENT } from './serviceSQS'
 export const sendPythonWorkerMessage = async (
   tenantId: string,
   body: PythonWorkerMessage,
+  messageGroupId: string = tenantId,
 ): Promise<void> => {
   if (IS_TEST_ENV) {
     return
@@ -19,7 +20,7 @@ export const sendPythonWorkerMessage = async (
 
   await sendMessage(SQS_CLIENT(), {
     QueueUrl: SQS_CONFIG.pythonWorkerQueue,
-    MessageGroupId: tenantId,
+    MessageGroupId: messageGroupId,
     MessageDeduplicationId: `${tenantId}-${moment().valueOf()}`,
     MessageBody: JSON.stringify(body),
   })